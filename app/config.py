@@ -13,6 +13,7 @@ class Config:
 
     # Vector Database Configuration
     QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+    QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 
     # Embedding Service Configuration - Jina Cloud API
     JINA_API_KEY = os.getenv("JINA_API_KEY")
@@ -20,12 +21,17 @@ class Config:
     VECTOR_SIZE = 1024  # Jina v3 default dimension
 
     # Data Processing Configuration
-    MIN_QUOTE_LENGTH = 50
-    CHUNK_SIZE = 1000
-    CHUNK_OVERLAP = 200
+    MIN_QUOTE_LENGTH = int(os.getenv("MIN_QUOTE_LENGTH", "50"))
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 
     # Ingestion Configuration
-    BATCH_SIZE = 10
+    # Texts per Jina /embed request and Qdrant upsert
+    BATCH_SIZE = int(os.getenv("BATCH_SIZE", "64"))
+    # Batches embedded/upserted concurrently
+    INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "4"))
+    # Qdrant HNSW indexing threshold restored after bulk loads
+    INDEXING_THRESHOLD = int(os.getenv("INDEXING_THRESHOLD", "20000"))
 
     DATA_PATH = "app/data/Harry Potter - Book 1 - The Sorcerers Stone.pdf"
     OUTPUT_PATH = "app/data/processed"
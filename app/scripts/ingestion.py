@@ -1,21 +1,77 @@
 """Data ingestion pipeline for loading processed data into Qdrant collections using LangChain."""
 
-import hashlib
-import json
+import asyncio
+import functools
+import itertools
+import queue
+import threading
 import time
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass
-from typing import Any, Dict, Generator, List, Optional, Set
-
+from typing import (
+    Any,
+    AsyncGenerator,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Union,
+)
+
+import orjson
+import xxhash
 from langchain_core.documents import Document
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HnswConfigDiff,
+    MatchAny,
+    OptimizersConfigDiff,
+    PayloadSelectorInclude,
+    PointStruct,
+    Range,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
+from tenacity import retry, stop_after_attempt, wait_random_exponential
 
 from app.config import Config
 from app.scripts.preprocessor import DataType, PreProcessor
 from app.utils.embeddings import Embedder
 
+_INT64_MASK = (1 << 63) - 1
+_CONTENT_HASH_KEY = "metadata.content_hash"  # Payload path of the dedup hash
+_HASH_LOOKUP_SIZE = 1000  # Hashes per MatchAny filter in duplicate lookups
+_POINT_ID_NAMESPACE = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+
+# Concurrent batches can trip the Jina rate limit; back off with jitter and
+# retry the batch instead of dropping it
+_retry_embedding = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_random_exponential(multiplier=0.5, max=10),
+    reraise=True,
+)
+
+
+@dataclass
+class _IngestionStats:
+    """Running counts for one streaming ingestion pass."""
+
+    total_chapters: int
+    seen: int = 0
+    skipped: int = 0
+    processed: int = 0
+    chapter: int = 0
+
 
 @dataclass
 class ProgressUpdate:
@@ -38,14 +94,44 @@ class ProgressUpdate:
         }
 
 
+def _encode_update(update: Union[ProgressUpdate, Dict[str, Any]]) -> str:
+    """Serialize a progress update as one JSON line; orjson encodes dataclasses natively."""
+    return orjson.dumps(update).decode() + "\n"
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client() -> QdrantClient:
+    """Create the Qdrant client once per process."""
+    # gRPC cuts serialization overhead on bulk upserts and scroll pages
+    return QdrantClient(
+        url=Config.QDRANT_URL, prefer_grpc=True, grpc_port=Config.QDRANT_GRPC_PORT
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embedder():
+    """Create the embedder once per process."""
+    return Embedder()  # Returns JinaEmbeddings instance
+
+
+@functools.cache
+def _get_vector_store(collection_name: str) -> QdrantVectorStore:
+    """Create one vector store per collection, shared by all pipeline instances."""
+    return QdrantVectorStore(
+        client=_get_client(),
+        collection_name=collection_name,
+        embedding=_get_embedder(),
+    )
+
+
 class QdrantIngestion:
     """Pipeline for ingesting documents into Qdrant collections using LangChain."""
 
     def __init__(self):
         """Initialize the ingestion pipeline with Qdrant client."""
-        self.client = QdrantClient(url=Config.QDRANT_URL)
-        self._embedder = None  # Lazy load embedder
-        self._vector_stores = {}  # Lazy load vector stores
+        self.client = _get_client()
+        # Async clients bind to the running event loop, so they stay per instance
+        self._async_client = None  # Lazy load async client for aingest_documents
 
         # Define collection names and their vector dimensions
         self.collections = {
@@ -53,30 +139,76 @@ class QdrantIngestion:
             DataType.QUOTES: {"name": "book_quotes", "size": Config.VECTOR_SIZE},
         }
 
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        """Lazy load the async Qdrant client used by the asyncio pipeline."""
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(
+                url=Config.QDRANT_URL,
+                prefer_grpc=True,
+                grpc_port=Config.QDRANT_GRPC_PORT,
+            )
+        return self._async_client
+
     @property
     def embedder(self):
         """Lazy load the embedder when needed."""
-        if self._embedder is None:
-            self._embedder = Embedder()  # Returns JinaEmbeddings instance
-        return self._embedder
+        return _get_embedder()
 
     def get_vector_store(self, collection_name: str) -> QdrantVectorStore:
         """Get or create a vector store for a collection."""
-        if collection_name not in self._vector_stores:
-            self._vector_stores[collection_name] = QdrantVectorStore(
-                client=self.client,
+        return _get_vector_store(collection_name)
+
+    @staticmethod
+    def compute_content_hash(content: str) -> int:
+        """Compute a non-cryptographic 64-bit hash of content for duplicate detection.
+
+        The top bit is masked off so the value fits Qdrant's signed int64 payload type.
+        """
+        return xxhash.xxh3_64_intdigest(content.encode("utf-8")) & _INT64_MASK
+
+    def drop_legacy_points(self, collection_name: str) -> int:
+        """Delete points that carry no integer content hash and return their count.
+
+        Earlier versions stored MD5 hex strings under random uuid4 ids, which
+        neither the integer hash lookup nor the uuid5 ids can match, so their
+        documents would be stored a second time. They are re-embedded from the
+        source by this run instead.
+        """
+        # Hashes are masked to int63, so every current point has a value >= 0
+        legacy_filter = Filter(
+            must_not=[FieldCondition(key=_CONTENT_HASH_KEY, range=Range(gte=0))]
+        )
+        try:
+            legacy = self.client.count(
+                collection_name=collection_name, count_filter=legacy_filter, exact=True
+            ).count
+        except Exception:
+            # Collection doesn't exist yet
+            return 0
+
+        if legacy:
+            self.client.delete(
                 collection_name=collection_name,
-                embedding=self.embedder,
+                points_selector=FilterSelector(filter=legacy_filter),
+                wait=True,
             )
-        return self._vector_stores[collection_name]
+        return legacy
 
     @staticmethod
-    def compute_content_hash(content: str) -> str:
-        """Compute MD5 hash of content for duplicate detection."""
-        return hashlib.md5(content.encode("utf-8")).hexdigest()
+    def _legacy_update(collection_name: str, legacy: int) -> str:
+        """Serialize the progress update reporting removed legacy points."""
+        update = ProgressUpdate(
+            progress=0,
+            message=f"Removed {legacy} points in the old hash format from "
+            f"{collection_name}; they will be re-ingested",
+        )
+        return _encode_update(update)
 
-    def get_existing_hashes(self, collection_name: str) -> Set[str]:
-        """Retrieve all existing content hashes from a collection."""
+    def find_existing_hashes(
+        self, collection_name: str, new_hashes: List[int]
+    ) -> Set[int]:
+        """Return the subset of new_hashes already stored in a collection."""
         try:
             existing_hashes = set()
 
@@ -89,26 +221,39 @@ class QdrantIngestion:
                 # Collection doesn't exist yet
                 return existing_hashes
 
-            # Scroll through all points and collect hashes
-            offset = None
-            while True:
-                records, offset = self.client.scroll(
-                    collection_name=collection_name,
-                    limit=100,
-                    offset=offset,
-                    with_payload=True,
-                    with_vectors=False,  # We don't need vectors, just metadata
+            # Ask Qdrant for matches only, so traffic scales with the new documents
+            unique_hashes = list(set(new_hashes))
+            for i in range(0, len(unique_hashes), _HASH_LOOKUP_SIZE):
+                hash_filter = Filter(
+                    must=[
+                        FieldCondition(
+                            key=_CONTENT_HASH_KEY,
+                            match=MatchAny(
+                                any=unique_hashes[i : i + _HASH_LOOKUP_SIZE]
+                            ),
+                        )
+                    ]
                 )
-
-                if not records:
-                    break
-
-                for record in records:
-                    if record.payload and "content_hash" in record.payload:
-                        existing_hashes.add(record.payload["content_hash"])
-
-                if offset is None:
-                    break
+                offset = None
+                while True:
+                    records, offset = self.client.scroll(
+                        collection_name=collection_name,
+                        scroll_filter=hash_filter,
+                        limit=_HASH_LOOKUP_SIZE,
+                        offset=offset,
+                        with_payload=PayloadSelectorInclude(
+                            include=[_CONTENT_HASH_KEY]
+                        ),
+                        with_vectors=False,  # We don't need vectors, just the hash
+                    )
+
+                    for record in records:
+                        metadata = (record.payload or {}).get("metadata") or {}
+                        if "content_hash" in metadata:
+                            existing_hashes.add(metadata["content_hash"])
+
+                    if not records or offset is None:
+                        break
 
             return existing_hashes
 
@@ -126,24 +271,43 @@ class QdrantIngestion:
             except Exception as e:
                 print(f"Error deleting collection {collection_name}: {e}")
 
-    def setup_collections(self) -> None:
-        """Set up Qdrant collections for chunks and quotes with payload indexing."""
+    def setup_collections(self, bulk: bool = False) -> None:
+        """Set up Qdrant collections for chunks and quotes with payload indexing.
+
+        With bulk=True, HNSW indexing starts disabled so the initial load is not
+        slowed by incremental segment rebuilds; ingest_documents re-enables it.
+        """
         for collection_info in self.collections.values():
             collection_name = collection_info["name"]
             try:
                 # Create collection
                 self.client.create_collection(
                     collection_name=collection_name,
+                    # Full-precision vectors and the HNSW graph are memory-mapped
+                    # from disk; searches hit the in-RAM quantized copies below
                     vectors_config=VectorParams(
-                        size=collection_info["size"], distance=Distance.COSINE
+                        size=collection_info["size"],
+                        distance=Distance.COSINE,
+                        on_disk=True,
+                    ),
+                    hnsw_config=HnswConfigDiff(on_disk=True, m=16, ef_construct=100),
+                    optimizers_config=(
+                        OptimizersConfigDiff(indexing_threshold=0) if bulk else None
+                    ),
+                    # Keep int8 copies of the vectors in RAM for search, a quarter
+                    # of the float32 footprint; originals remain for rescoring
+                    quantization_config=ScalarQuantization(
+                        scalar=ScalarQuantizationConfig(
+                            type=ScalarType.INT8, always_ram=True
+                        )
                     ),
                 )
 
-                # Create text index on content for duplicate detection
+                # Index the content hash so duplicate lookups can filter server-side
                 self.client.create_payload_index(
                     collection_name=collection_name,
-                    field_name="content",
-                    field_schema="text",  # Enable full-text search on content
+                    field_name=_CONTENT_HASH_KEY,
+                    field_schema="integer",
                 )
 
                 print(f"✓ Created collection and indices: {collection_name}")
@@ -153,31 +317,69 @@ class QdrantIngestion:
                 else:
                     print(f"Error creating collection {collection_name}: {e}")
 
-    def process_batch(
-        self, documents: List[Dict[str, Any]], collection_name: str
-    ) -> int:
-        """Process a batch of documents using LangChain's vector store."""
-        batch_start_time = time.time()
+    def enable_indexing(self, collection_name: str) -> None:
+        """Restore the HNSW indexing threshold if a bulk setup disabled it.
 
+        Collections created without bulk=True, or already restored, are left
+        untouched so their optimizer config is not rewritten on every run.
+        """
         try:
-            # Convert to LangChain documents and add content hash to metadata
-            langchain_docs = []
-            for doc in documents:
-                # Compute content hash and add to metadata
-                content_hash = self.compute_content_hash(doc["content"])
-                metadata = doc["metadata"].copy()
-                metadata["content_hash"] = content_hash
-
-                langchain_docs.append(
-                    Document(page_content=doc["content"], metadata=metadata)
+            info = self.client.get_collection(collection_name)
+            if info.config.optimizer_config.indexing_threshold != 0:
+                return
+            self.client.update_collection(
+                collection_name=collection_name,
+                optimizers_config=OptimizersConfigDiff(
+                    indexing_threshold=Config.INDEXING_THRESHOLD
+                ),
+            )
+        except Exception as e:
+            print(f"Error enabling indexing for {collection_name}: {e}")
+
+    def _build_points(
+        self,
+        documents: List[Document],
+        vectors: List[List[float]],
+        collection_name: str,
+    ) -> List[PointStruct]:
+        """Build points with the same payload layout QdrantVectorStore reads back."""
+        vector_store = self.get_vector_store(collection_name)
+        points = []
+        for doc, vector in zip(documents, vectors):
+            # _iter_new_batches stored the content hash in the metadata, which
+            # belongs to a Document freshly built for this pass
+            metadata = doc.metadata
+
+            # Derive the point ID from the content hash so re-ingesting a document
+            # overwrites its existing point instead of adding a duplicate
+            point_id = str(
+                uuid.uuid5(_POINT_ID_NAMESPACE, str(metadata["content_hash"]))
+            )
+
+            points.append(
+                PointStruct(
+                    id=point_id,
+                    vector=vector,
+                    payload={
+                        vector_store.content_payload_key: doc.page_content,
+                        vector_store.metadata_payload_key: metadata,
+                    },
                 )
+            )
+        return points
+
+    def process_batch(self, documents: List[Document], collection_name: str) -> int:
+        """Embed a batch of documents in a single request and upsert them into Qdrant."""
+        batch_start_time = time.time()
+
+        try:
+            texts = [doc.page_content for doc in documents]
 
-            # Generate UUIDs for the batch
-            doc_ids = [str(uuid.uuid4()) for _ in documents]
+            # Jina accepts a list input, so the whole batch is one /embed roundtrip
+            vectors = _retry_embedding(self.embedder.embed_documents)(texts)
 
-            # Add documents to vector store
-            vector_store = self.get_vector_store(collection_name)
-            vector_store.add_documents(documents=langchain_docs, ids=doc_ids)
+            points = self._build_points(documents, vectors, collection_name)
+            self.client.upsert(collection_name=collection_name, points=points)
 
             batch_time = time.time() - batch_start_time
             print(
@@ -190,131 +392,312 @@ class QdrantIngestion:
             print(f"Error processing batch: {e}")
             return 0
 
-    def ingest_documents(
-        self, data_type: DataType, batch_size: int = Config.BATCH_SIZE
-    ) -> Generator[str, None, None]:
-        """Ingest documents into specified collection with progress updates."""
-        collection_info = self.collections.get(data_type)
-        if not collection_info:
-            update = ProgressUpdate(progress=0, error=f"Unknown data type: {data_type}")
-            yield json.dumps(update.dict()) + "\n"
-            return
+    async def aprocess_batch(
+        self, documents: List[Document], collection_name: str
+    ) -> int:
+        """Async variant of process_batch using the async Qdrant client.
 
-        # Initialize preprocessor and get documents
-        preprocessor = PreProcessor()
-        if data_type == DataType.CHUNKS:
-            processed_data = preprocessor.get_chunks()
-        else:  # DataType.QUOTES
-            processed_data = preprocessor.get_quotes()
+        JinaEmbeddings has no native async API, so the embedding request still
+        runs on the default executor; only the upsert is truly non-blocking.
+        """
+        batch_start_time = time.time()
 
-        documents = processed_data.documents
-        total_documents = len(documents)
+        try:
+            texts = [doc.page_content for doc in documents]
+            vectors = await _retry_embedding(self.embedder.aembed_documents)(texts)
 
-        if total_documents == 0:
-            update = ProgressUpdate(progress=0, error="No documents to process")
-            yield json.dumps(update.dict()) + "\n"
-            return
+            points = self._build_points(documents, vectors, collection_name)
+            await self.async_client.upsert(
+                collection_name=collection_name, points=points
+            )
 
-        collection_name = collection_info["name"]
+            batch_time = time.time() - batch_start_time
+            print(
+                f"Inserted {len(documents)} documents in {batch_time:.2f} seconds. "
+                f"Speed: {len(documents) / batch_time:.2f} docs/sec"
+            )
+            return len(documents)
+
+        except Exception as e:
+            print(f"Error processing batch: {e}")
+            return 0
 
-        # Get existing hashes once upfront (much faster than per-document checks)
-        print(f"Checking for existing documents in {collection_name}...")
-        existing_hashes = self.get_existing_hashes(collection_name)
-        print(f"Found {len(existing_hashes)} existing documents")
+    def _iter_new_batches(
+        self,
+        documents: Iterator[Document],
+        collection_name: str,
+        batch_size: int,
+        stats: _IngestionStats,
+    ) -> Iterator[List[Document]]:
+        """Lazily yield batches of documents not yet stored in the collection."""
+        # Check duplicates a window at a time so only one window is held in memory
+        window_size = max(batch_size, _HASH_LOOKUP_SIZE)
+        # Hashes queued earlier in this run; the server cannot report them yet
+        queued: Set[int] = set()
+        while window := list(itertools.islice(documents, window_size)):
+            content_hashes = [
+                self.compute_content_hash(doc.page_content) for doc in window
+            ]
+            existing_hashes = self.find_existing_hashes(
+                collection_name, [h for h in content_hashes if h not in queued]
+            )
+
+            # Keep new Documents as they are, carrying the hash computed above
+            # in their metadata for duplicate detection on later runs
+            new_documents = []
+            for doc, content_hash in zip(window, content_hashes):
+                if content_hash in existing_hashes or content_hash in queued:
+                    continue
+                queued.add(content_hash)
+                doc.metadata["content_hash"] = content_hash
+                new_documents.append(doc)
 
-        # Filter out duplicates and prepare documents for ingestion
-        new_documents = []
-        skipped_count = 0
+            stats.seen += len(window)
+            stats.skipped += len(window) - len(new_documents)
+            stats.chapter = window[-1].metadata.get("chapter_number", stats.chapter)
 
-        for doc in documents:
-            content_hash = self.compute_content_hash(doc.page_content)
+            for i in range(0, len(new_documents), batch_size):
+                yield new_documents[i : i + batch_size]
 
-            if content_hash in existing_hashes:
-                skipped_count += 1
-                continue
+    @staticmethod
+    def _batch_progress(stats: _IngestionStats, processed: int) -> str:
+        """Record a finished batch and serialize its progress update."""
+        stats.processed += processed
 
-            # Convert Document to dict format
-            doc_dict = {"content": doc.page_content, "metadata": doc.metadata}
-            new_documents.append(doc_dict)
+        # The total is unknown while streaming, so estimate from chapters consumed
+        progress = min(99, int(stats.chapter / max(stats.total_chapters, 1) * 100))
+        update = ProgressUpdate(
+            progress=progress,
+            processed=stats.processed,
+            total=stats.seen - stats.skipped,
+            message=f"Processed batch: {processed} documents",
+        )
+        return _encode_update(update)
 
-        if skipped_count > 0:
-            print(f"Skipped {skipped_count} duplicate documents")
+    @staticmethod
+    def _final_update(data_type: DataType, stats: _IngestionStats) -> ProgressUpdate:
+        """Build the closing progress update for one data type."""
+        if stats.seen == 0:
+            return ProgressUpdate(progress=0, error="No documents to process")
 
-        if len(new_documents) == 0:
-            update = ProgressUpdate(
+        if stats.skipped == stats.seen:
+            return ProgressUpdate(
                 progress=100,
                 processed=0,
-                total=total_documents,
-                message=f"All {total_documents} documents already exist. Nothing to ingest.",
+                total=stats.seen,
+                message=f"All {stats.seen} documents already exist. Nothing to ingest.",
             )
-            yield json.dumps(update.dict()) + "\n"
+
+        return ProgressUpdate(
+            progress=100,
+            processed=stats.processed,
+            total=stats.seen - stats.skipped,
+            message=f"Completed ingestion for {data_type.value} ({stats.skipped} duplicates skipped)",
+        )
+
+    def ingest_documents(
+        self, data_type: DataType, batch_size: int = Config.BATCH_SIZE
+    ) -> Generator[str, None, None]:
+        """Ingest documents into specified collection with progress updates.
+
+        Documents are streamed from the preprocessor, so only the current
+        duplicate-check window and in-flight batches are held in memory.
+        """
+        collection_info = self.collections.get(data_type)
+        if not collection_info:
+            update = ProgressUpdate(progress=0, error=f"Unknown data type: {data_type}")
+            yield _encode_update(update)
             return
 
-        print(f"Ingesting {len(new_documents)} new documents...")
-        processed_documents = 0
-
-        # Process documents in batches
-        current_batch = []
-        for doc_dict in new_documents:
-            current_batch.append(doc_dict)
-
-            # Process batch when it reaches the size limit
-            if len(current_batch) >= Config.BATCH_SIZE:
-                processed = self.process_batch(current_batch, collection_name)
-                processed_documents += processed
-                current_batch = []
-
-                # Send progress update
-                progress = int((processed_documents / len(new_documents)) * 100)
-                update = ProgressUpdate(
-                    progress=progress,
-                    processed=processed_documents,
-                    total=len(new_documents),
-                    message=f"Processed batch: {processed} documents",
-                )
-                yield json.dumps(update.dict()) + "\n"
+        collection_name = collection_info["name"]
+        if legacy := self.drop_legacy_points(collection_name):
+            yield self._legacy_update(collection_name, legacy)
+        preprocessor = PreProcessor()
+        stats = _IngestionStats(total_chapters=preprocessor.count_chapters())
+        batches = self._iter_new_batches(
+            preprocessor.iter_documents(data_type), collection_name, batch_size, stats
+        )
+        self.get_vector_store(collection_name)  # Build lazily-loaded clients once
 
-        # Process remaining documents
-        if current_batch:
-            processed = self.process_batch(current_batch, collection_name)
-            processed_documents += processed
+        # Overlap embed/upsert roundtrips in a bounded pool; both the Qdrant
+        # client and Jina session are thread-safe
+        try:
+            with ThreadPoolExecutor(max_workers=Config.INGESTION_WORKERS) as executor:
+                futures = set()
+                for batch in batches:
+                    futures.add(
+                        executor.submit(self.process_batch, batch, collection_name)
+                    )
+                    # Keep at most one batch per worker in flight
+                    if len(futures) < Config.INGESTION_WORKERS:
+                        continue
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield self._batch_progress(stats, future.result())
+
+                for future in as_completed(futures):
+                    yield self._batch_progress(stats, future.result())
+        finally:
+            batches.close()
+            # After a bulk load, build the HNSW index in one pass
+            self.enable_indexing(collection_name)
+
+        yield _encode_update(self._final_update(data_type, stats))
+
+    async def aingest_documents(
+        self, data_type: DataType, batch_size: int = Config.BATCH_SIZE
+    ) -> AsyncGenerator[str, None]:
+        """Async variant of ingest_documents that overlaps batches on one event loop."""
+        collection_info = self.collections.get(data_type)
+        if not collection_info:
+            update = ProgressUpdate(progress=0, error=f"Unknown data type: {data_type}")
+            yield _encode_update(update)
+            return
 
-        # Final update
-        update = ProgressUpdate(
-            progress=100,
-            processed=processed_documents,
-            total=len(new_documents),
-            message=f"Completed ingestion for {data_type.value} ({skipped_count} duplicates skipped)",
+        collection_name = collection_info["name"]
+        if legacy := await asyncio.to_thread(self.drop_legacy_points, collection_name):
+            yield self._legacy_update(collection_name, legacy)
+        preprocessor = PreProcessor()
+        total_chapters = await asyncio.to_thread(preprocessor.count_chapters)
+        stats = _IngestionStats(total_chapters=total_chapters)
+        batches = self._iter_new_batches(
+            preprocessor.iter_documents(data_type), collection_name, batch_size, stats
         )
-        yield json.dumps(update.dict()) + "\n"
+        self.get_vector_store(collection_name)  # Build lazily-loaded clients once
+
+        tasks = set()
+        try:
+            # Chunking and duplicate lookups are blocking, so pull batches off the loop
+            while batch := await asyncio.to_thread(next, batches, None):
+                tasks.add(
+                    asyncio.ensure_future(self.aprocess_batch(batch, collection_name))
+                )
+                # Bound in-flight embed/upsert roundtrips like the threaded pipeline
+                if len(tasks) < Config.INGESTION_WORKERS:
+                    continue
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield self._batch_progress(stats, task.result())
+
+            for next_done in asyncio.as_completed(tasks):
+                yield self._batch_progress(stats, await next_done)
+        finally:
+            for task in tasks:
+                task.cancel()
+            batches.close()
+            # After a bulk load, build the HNSW index in one pass
+            self.enable_indexing(collection_name)
+
+        yield _encode_update(self._final_update(data_type, stats))
 
     def ingest_all(
         self, batch_size: int = Config.BATCH_SIZE
     ) -> Generator[str, None, None]:
-        """Ingest both chunks and quotes with progress updates."""
-        total_progress = 0
-
-        for data_type in [DataType.CHUNKS, DataType.QUOTES]:
-            print(f"\nProcessing {data_type.value}...")
+        """Ingest chunks and quotes concurrently, merging their progress updates."""
+        data_types = [DataType.CHUNKS, DataType.QUOTES]
+        # Parse the PDF and split the chunks up front, so both pipelines share the
+        # cached chapters and the chunk pipeline never forks its process pool
+        # from a worker thread while the other pipeline's threads are running
+        PreProcessor().warm_chunk_cache()
+
+        updates: queue.Queue = queue.Queue()
+        # Set when the consumer stops early (Ctrl-C or a closed generator), so
+        # the pipelines wind down after their in-flight batches
+        stop = threading.Event()
+
+        def run(data_type: DataType) -> None:
+            try:
+                print(f"\nProcessing {data_type.value}...")
+                for update_str in self.ingest_documents(data_type, batch_size):
+                    if stop.is_set():
+                        break
+                    updates.put((data_type, update_str))
+            finally:
+                updates.put((data_type, None))
+
+        # The collections are independent, so their embed/upsert pipelines overlap
+        progress = dict.fromkeys(data_types, 0)
+        executor = ThreadPoolExecutor(max_workers=len(data_types))
+        finished = False
+        try:
+            futures = [executor.submit(run, data_type) for data_type in data_types]
+            running = len(futures)
+            while running:
+                data_type, update_str = updates.get()
+                if update_str is None:
+                    running -= 1
+                    continue
+                yield self._merge_progress(update_str, data_type, progress)
+
+            for future in futures:
+                future.result()  # Re-raise a failed pipeline's error
+            finished = True
+        finally:
+            stop.set()
+            # Only a completed run waits; an interrupted one returns right away
+            executor.shutdown(wait=finished, cancel_futures=True)
 
-            for update_str in self.ingest_documents(data_type, batch_size):
-                update = json.loads(update_str)
+        # Final completion message
+        update = ProgressUpdate(
+            progress=100, message="All collections processed successfully!"
+        )
+        yield _encode_update(update)
 
-                # Adjust progress to account for multiple collections
-                adjusted_progress = total_progress + (
-                    update["progress"] / len(self.collections)
-                )
-                update["progress"] = int(adjusted_progress)
+    async def aingest_all(
+        self, batch_size: int = Config.BATCH_SIZE
+    ) -> AsyncGenerator[str, None]:
+        """Async variant of ingest_all."""
+        data_types = [DataType.CHUNKS, DataType.QUOTES]
+        # Split in this thread before either pipeline starts its workers
+        PreProcessor().warm_chunk_cache()
 
-                yield json.dumps(update) + "\n"
+        updates: asyncio.Queue = asyncio.Queue()
 
-            total_progress += 100 / len(self.collections)
+        async def run(data_type: DataType) -> None:
+            try:
+                print(f"\nProcessing {data_type.value}...")
+                async for update_str in self.aingest_documents(data_type, batch_size):
+                    updates.put_nowait((data_type, update_str))
+            finally:
+                updates.put_nowait((data_type, None))
+
+        progress = dict.fromkeys(data_types, 0)
+        tasks = [asyncio.ensure_future(run(data_type)) for data_type in data_types]
+        try:
+            running = len(tasks)
+            while running:
+                data_type, update_str = await updates.get()
+                if update_str is None:
+                    running -= 1
+                    continue
+                yield self._merge_progress(update_str, data_type, progress)
+
+            for task in tasks:
+                await task  # Re-raise a failed pipeline's error
+        finally:
+            # Cancel both pipelines on exit and wait until they have unwound
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
         # Final completion message
         update = ProgressUpdate(
             progress=100, message="All collections processed successfully!"
         )
-        yield json.dumps(update.dict()) + "\n"
+        yield _encode_update(update)
+
+    @staticmethod
+    def _merge_progress(
+        update_str: str, data_type: DataType, progress: Dict[DataType, int]
+    ) -> str:
+        """Rescale one collection's update to the overall progress of all of them."""
+        update = orjson.loads(update_str)
+        progress[data_type] = update["progress"]
+        # Each collection contributes an equal share of the overall progress
+        update["progress"] = int(sum(progress.values()) / len(progress))
+        return _encode_update(update)
 
 
 if __name__ == "__main__":
@@ -327,6 +710,17 @@ if __name__ == "__main__":
     parser.add_argument(
         "--cleanup", action="store_true", help="Delete all collections before setup"
     )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Create collections with indexing deferred until ingestion finishes",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Pipeline batches on an asyncio event loop instead of a thread pool",
+    )
     parser.add_argument(
         "--batch-size",
         type=int,
@@ -351,25 +745,44 @@ if __name__ == "__main__":
 
     # Setup collections if requested
     if args.setup or args.cleanup:  # Always setup after cleanup
-        pipeline.setup_collections()
+        pipeline.setup_collections(bulk=args.bulk)
 
     # Process based on data type
     if args.data_type == "all":
-        generator = pipeline.ingest_all(args.batch_size)
+        data_type = None
     else:
         data_type = DataType.CHUNKS if args.data_type == "chunks" else DataType.QUOTES
-        generator = pipeline.ingest_documents(data_type, args.batch_size)
+
+    def print_update(update_str: str):
+        """Print one JSON progress update from the ingestion generators."""
+        update = orjson.loads(update_str)
+        if update.get("error"):
+            print(f"Error: {update['error']}")
+        else:
+            progress = update["progress"]
+            message = update.get("message", "")
+            print(f"Progress: {progress}% - {message}")
+
+    async def drain_async():
+        """Run the async ingestion generators to completion."""
+        if data_type is None:
+            generator = pipeline.aingest_all(args.batch_size)
+        else:
+            generator = pipeline.aingest_documents(data_type, args.batch_size)
+        async for update_str in generator:
+            print_update(update_str)
 
     # Process and print updates
     try:
-        for update_str in generator:
-            update = json.loads(update_str)
-            if update.get("error"):
-                print(f"Error: {update['error']}")
+        if args.use_async:
+            asyncio.run(drain_async())
+        else:
+            if data_type is None:
+                generator = pipeline.ingest_all(args.batch_size)
             else:
-                progress = update["progress"]
-                message = update.get("message", "")
-                print(f"Progress: {progress}% - {message}")
+                generator = pipeline.ingest_documents(data_type, args.batch_size)
+            for update_str in generator:
+                print_update(update_str)
     except KeyboardInterrupt:
         print("\nIngestion interrupted by user")
     except Exception as e:
@@ -1,10 +1,15 @@
 """Data preprocessing utilities for Harry Potter text into chunks, summaries, and quotes."""
 
+import functools
+import io
+import itertools
+import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 import pymupdf
 from langchain.docstore.document import Document
@@ -12,6 +17,64 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from app.config import Config
 
+# Bump when cleaning or chapter extraction changes so stale disk caches are ignored
+_CACHE_VERSION = 2
+
+# Plain-text extraction without ligature preservation or other layout extras
+_TEXT_FLAGS = pymupdf.TEXT_PRESERVE_WHITESPACE | pymupdf.TEXT_MEDIABOX_CLIP
+
+# Text cleanup patterns, compiled once at import
+_BOOK_TITLE_RE = re.compile(
+    r"HP\s*1\s*-\s*Harry\s*Potter\s*and\s*the\s*Sorcerer\'s\s*Stone"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+_CHAPTER_RE = re.compile(r"CHAPTER\s[A-Z]+")
+_QUOTE_RE = re.compile(r'"([^"]*)"')
+# Drop curly single quotes and straighten curly double quotes in one pass
+_QUOTE_TRANSLATION = str.maketrans({"\u2019": None, "\u201c": '"', "\u201d": '"'})
+
+
+def _build_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Create the text splitter used for chunking chapters."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=Config.CHUNK_SIZE,
+        chunk_overlap=Config.CHUNK_OVERLAP,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+_get_text_splitter = functools.lru_cache(maxsize=1)(_build_text_splitter)
+
+
+def _split_chapter(chapter: Dict[str, Any]) -> List[Document]:
+    """Split one chapter into chunk documents; module-level so worker processes can pickle it."""
+    # Create a document for each chapter
+    chapter_doc = Document(
+        page_content=chapter["content"],
+        metadata={
+            "chapter_number": chapter["number"],
+            "chapter_title": chapter["title"],
+            "source": "harry_potter_book_1",
+            "data_type": "chapter",
+        },
+    )
+
+    # Split chapter into chunks
+    chunks = _get_text_splitter().split_documents([chapter_doc])
+
+    # Add chunk-specific metadata
+    for i, chunk in enumerate(chunks):
+        chunk.metadata.update(
+            {
+                "chunk_index": i,
+                "chunk_id": f"ch{chapter['number']}_chunk{i}",
+                "data_type": "chunk",
+            }
+        )
+
+    return chunks
+
 
 class DataType(Enum):
     """Enum for different types of processed data."""
@@ -32,55 +95,95 @@ class ProcessedData:
 class PreProcessor:
     """Class for preprocessing Harry Potter text into different data formats."""
 
+    # Parsed chapters shared across instances, keyed by source file cache key
+    _chapters_cache: Dict[str, List[Dict[str, Any]]] = {}
+
     def __init__(self):
         self.pdf_path = Config.DATA_PATH
         self.full_text = None
         self.chapters = None
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=Config.CHUNK_SIZE,
-            chunk_overlap=Config.CHUNK_OVERLAP,
-            length_function=len,
-            is_separator_regex=False,
-        )
+        self.text_splitter = _build_text_splitter()
+
+    def _cache_key(self) -> str:
+        """Build a cache key from the source PDF's modification time and size."""
+        stat = os.stat(self.pdf_path)
+        return f"v{_CACHE_VERSION}-{stat.st_mtime_ns}-{stat.st_size}"
 
     def _load_and_clean_text(self) -> str:
+        """Load cleaned text from the disk cache, or extract and cache it from the PDF."""
+        cache_path = os.path.join(
+            Config.OUTPUT_PATH, f"cleaned_{self._cache_key()}.txt"
+        )
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                return f.read()
+
+        full_text = self._clean_pdf_text()
+
+        os.makedirs(Config.OUTPUT_PATH, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(full_text)
+
+        return full_text
+
+    def _clean_pdf_text(self) -> str:
         """Load PDF and clean the text while preserving double quotes."""
-        doc = pymupdf.open(self.pdf_path)
-        full_text = " ".join([page.get_text() for page in doc])
+        # Stream pages into one buffer; ligatures are expanded rather than kept
+        # as single glyphs, which the non-ASCII pass below would otherwise drop
+        buffer = io.StringIO()
+        with pymupdf.open(self.pdf_path) as doc:
+            for page in doc:
+                buffer.write(page.get_text("text", flags=_TEXT_FLAGS))
+                buffer.write(" ")
+        full_text = buffer.getvalue()
 
         # Remove book title occurrences
-        full_text = re.sub(
-            r"HP\s*1\s*-\s*Harry\s*Potter\s*and\s*the\s*Sorcerer\'s\s*Stone",
-            "",
-            full_text,
-        )
+        full_text = _BOOK_TITLE_RE.sub("", full_text)
 
         # Remove single quotes but preserve double quotes
-        full_text = full_text.replace("’", "")
-        full_text = full_text.replace("“", '"')
-        full_text = full_text.replace("”", '"')
+        full_text = full_text.translate(_QUOTE_TRANSLATION)
 
         # Remove unnecessary whitespaces and newlines
-        full_text = re.sub(r"\s+", " ", full_text).strip()
+        full_text = _WHITESPACE_RE.sub(" ", full_text).strip()
 
-        # Remove non-English characters but preserve double quotes and common punctuation
-        full_text = re.sub(r'[^\x00-\x7F".,!?;:()-]+', "", full_text)
+        # Remove non-English characters; quotes and punctuation are ASCII, so
+        # dropping every non-ASCII code point in one C-level pass preserves them
+        full_text = full_text.encode("ascii", "ignore").decode("ascii")
 
         return full_text
 
     def _extract_chapters(self) -> List[Dict[str, Any]]:
+        """Load chapters from the shared or disk cache, or extract and cache them."""
+        cache_key = self._cache_key()
+        if cache_key in self._chapters_cache:
+            return self._chapters_cache[cache_key]
+
+        cache_path = os.path.join(Config.OUTPUT_PATH, f"chapters_{cache_key}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                chapters = json.load(f)
+        else:
+            chapters = self._split_chapters()
+            os.makedirs(Config.OUTPUT_PATH, exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(chapters, f)
+
+        self._chapters_cache[cache_key] = chapters
+        return chapters
+
+    def _split_chapters(self) -> List[Dict[str, Any]]:
         """Extract chapters from the text."""
         if self.full_text is None:
             self.full_text = self._load_and_clean_text()
 
-        # Split into chapters
-        chapter_texts = re.split(r"CHAPTER\s[A-Z]+", self.full_text)
-
-        chapter_texts.pop(0)
+        # Slice between consecutive chapter headings, skipping any front matter
+        headings = list(_CHAPTER_RE.finditer(self.full_text))
+        starts = [match.end() for match in headings]
+        ends = [match.start() for match in headings[1:]] + [len(self.full_text)]
 
         chapters = []
-        for i, chapter_text in enumerate(chapter_texts):
-            cleaned_text = chapter_text.strip()
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            cleaned_text = self.full_text[start:end].strip()
             if cleaned_text:  # Only include non-empty chapters
                 chapters.append(
                     {
@@ -94,38 +197,61 @@ class PreProcessor:
 
         return chapters
 
-    def get_chunks(self) -> ProcessedData:
-        """Get text chunks using RecursiveCharacterTextSplitter."""
+    def count_chapters(self) -> int:
+        """Return the number of chapters, used to estimate streaming progress."""
         if self.chapters is None:
             self.chapters = self._extract_chapters()
+        return len(self.chapters)
+
+    def _chunks_cache_path(self) -> str:
+        """Return the disk cache file of the chunks for the current splitter settings."""
+        # Chunks depend only on the source and the splitter settings, so reruns
+        # with the same settings read them back instead of splitting again
+        return os.path.join(
+            Config.OUTPUT_PATH,
+            f"chunks_{self._cache_key()}-{Config.CHUNK_SIZE}-{Config.CHUNK_OVERLAP}.json",
+        )
 
-        documents = []
+    def warm_chunk_cache(self) -> None:
+        """Split the chapters into the chunk disk cache unless it already exists.
 
-        for chapter in self.chapters:
-            # Create a document for each chapter
-            chapter_doc = Document(
-                page_content=chapter["content"],
-                metadata={
-                    "chapter_number": chapter["number"],
-                    "chapter_title": chapter["title"],
-                    "source": "harry_potter_book_1",
-                    "data_type": "chapter",
-                },
-            )
+        Splitting forks a process pool, so multi-threaded callers run this from
+        the main thread before starting their threads; forking while other
+        threads hold locks can deadlock the child processes.
+        """
+        if not os.path.exists(self._chunks_cache_path()):
+            for _ in self.iter_chunks():
+                pass
 
-            # Split chapter into chunks
-            chunks = self.text_splitter.split_documents([chapter_doc])
+    def iter_chunks(self) -> Iterator[Document]:
+        """Lazily yield text chunks chapter by chapter."""
+        if self.chapters is None:
+            self.chapters = self._extract_chapters()
 
-            # Add chunk-specific metadata
-            for i, chunk in enumerate(chunks):
-                chunk.metadata.update(
-                    {
-                        "chunk_index": i,
-                        "chunk_id": f"ch{chapter['number']}_chunk{i}",
-                        "data_type": "chunk",
-                    }
-                )
-                documents.append(chunk)
+        cache_path = self._chunks_cache_path()
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                for content, metadata in json.load(f):
+                    yield Document(page_content=content, metadata=metadata)
+            return
+
+        # Chapters split independently, so fan them out across CPU cores
+        split = []
+        max_workers = min(len(self.chapters), os.cpu_count() or 1) or 1
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_lists = executor.map(_split_chapter, self.chapters, chunksize=1)
+            for chunk in itertools.chain.from_iterable(chunk_lists):
+                split.append([chunk.page_content, dict(chunk.metadata)])
+                yield chunk
+
+        # Only a fully consumed pass is written, so the cache is never partial
+        os.makedirs(Config.OUTPUT_PATH, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(split, f)
+
+    def get_chunks(self) -> ProcessedData:
+        """Get text chunks using RecursiveCharacterTextSplitter."""
+        documents = list(self.iter_chunks())
 
         return ProcessedData(
             data_type=DataType.CHUNKS,
@@ -138,39 +264,44 @@ class PreProcessor:
             },
         )
 
-    def get_quotes(self) -> ProcessedData:
-        """Extract quotes from the text using improved pattern matching."""
+    def iter_quotes(self) -> Iterator[Document]:
+        """Lazily yield quotes extracted from each chapter."""
         if self.chapters is None:
             self.chapters = self._extract_chapters()
 
-        documents = []
-
         # Extract dialogue using the improved pattern
         for chapter in self.chapters:
             chapter_text = chapter["content"]
-
-            # Find all quotes matching the minimum length requirement
-            quotes = re.findall('"([^"]*)"', chapter_text)
-            # filter out quotes that are less than min_length
-            quotes = [
-                quote for quote in quotes if len(quote) >= Config.MIN_QUOTE_LENGTH
-            ]
+            # Shared chapter fields, merged into each quote's own metadata
+            base_meta = {
+                "chapter_number": chapter["number"],
+                "chapter_title": chapter["title"],
+            }
+
+            # Stream quoted spans, keeping those meeting the minimum length
+            quotes = (
+                match.group(1)
+                for match in _QUOTE_RE.finditer(chapter_text)
+                if match.end(1) - match.start(1) >= Config.MIN_QUOTE_LENGTH
+            )
 
             for i, quote_text in enumerate(quotes):
                 # Clean up the quote text
                 cleaned_quote = quote_text.strip()
 
                 if cleaned_quote:  # Only include non-empty quotes
-                    quote_doc = Document(
+                    yield Document(
                         page_content=cleaned_quote,
                         metadata={
-                            "chapter_number": chapter["number"],
-                            "chapter_title": chapter["title"],
+                            **base_meta,
                             "quote_index": i,
                             "quote_length": len(cleaned_quote),
                         },
                     )
-                    documents.append(quote_doc)
+
+    def get_quotes(self) -> ProcessedData:
+        """Extract quotes from the text using improved pattern matching."""
+        documents = list(self.iter_quotes())
 
         return ProcessedData(
             data_type=DataType.QUOTES,
@@ -182,6 +313,12 @@ class PreProcessor:
             },
         )
 
+    def iter_documents(self, data_type: DataType) -> Iterator[Document]:
+        """Lazily yield the documents of one data type."""
+        if data_type == DataType.CHUNKS:
+            return self.iter_chunks()
+        return self.iter_quotes()
+
     def get_all_processed_data(self) -> Dict[DataType, ProcessedData]:
         """Get all three types of processed data."""
         return {DataType.CHUNKS: self.get_chunks(), DataType.QUOTES: self.get_quotes()}
@@ -3,6 +3,7 @@
 from langgraph.graph import END, START, StateGraph
 
 from agent.utils.nodes import (
+    answer_after_retrieval_node,
     answer_question_from_context_node,
     break_down_plan_node,
     get_final_answer_node,
@@ -16,14 +17,23 @@ from agent.utils.retrieval_nodes import (
     retrieve_chunks_context_per_question,
 )
 from agent.utils.state import Input, PlanExecute
-from agent.utils.workflow import build_retrieval_workflow
+from agent.utils.workflow import build_plan_step_node, build_retrieval_workflow
 
 graph_builder = StateGraph(PlanExecute, input=Input)
 
 # Add nodes
 graph_builder.add_node("planner", planner_node)
 graph_builder.add_node("break_down_plan", break_down_plan_node)
-graph_builder.add_node("task_handler", task_handler_node)
+graph_builder.add_node(
+    "task_handler",
+    task_handler_node,
+    destinations=("retrieve_chunks", "retrieve_quotes", "answer"),
+)
+graph_builder.add_node(
+    "answer_after_retrieval",
+    answer_after_retrieval_node,
+    destinations=("answer", "replanner"),
+)
 graph_builder.add_node("answer", answer_question_from_context_node)
 graph_builder.add_node("get_final_answer", get_final_answer_node)
 
@@ -36,41 +46,27 @@ quotes_retrieval_workflow = build_retrieval_workflow(
     retrieve_book_quotes_context_per_question,
 )
 
-graph_builder.add_node("retrieve_chunks", chunks_retrieval_workflow)
-graph_builder.add_node("retrieve_quotes", quotes_retrieval_workflow)
+graph_builder.add_node(
+    "retrieve_chunks", build_plan_step_node(chunks_retrieval_workflow)
+)
+graph_builder.add_node(
+    "retrieve_quotes", build_plan_step_node(quotes_retrieval_workflow)
+)
 graph_builder.add_node("replanner", replanner_node)
 
 
-def route_based_on_tool(state: PlanExecute) -> str:
-    """Route to the appropriate retrieval workflow based on the tool selected."""
-    tool = state.tool
-    if tool == "retrieve_chunks":
-        return "retrieve_chunks"
-    elif tool == "retrieve_quotes":
-        return "retrieve_quotes"
-    elif tool == "answer_from_context":
-        return "answer"
-
-
 # Add edges
 graph_builder.add_edge(START, "planner")
 graph_builder.add_edge("planner", "break_down_plan")
-graph_builder.add_edge("break_down_plan", "task_handler")
 
-# Add conditional edges from task_handler to retrieval workflows
-graph_builder.add_conditional_edges(
-    "task_handler",
-    route_based_on_tool,
-    {
-        "retrieve_chunks": "retrieve_chunks",
-        "retrieve_quotes": "retrieve_quotes",
-        "answer": "answer",
-    },
-)
+# task_handler decides all plan steps at once and sends the retrieval steps to
+# their workflows in parallel; answer-from-context steps wait for them
+graph_builder.add_edge("break_down_plan", "task_handler")
 
-# Add edges from retrieval workflows back to replanner
-graph_builder.add_edge("retrieve_chunks", "replanner")
-graph_builder.add_edge("retrieve_quotes", "replanner")
+# Once every retrieval branch has merged, answer the held-back steps from the
+# updated context, or go on to the replanner if there are none
+graph_builder.add_edge("retrieve_chunks", "answer_after_retrieval")
+graph_builder.add_edge("retrieve_quotes", "answer_after_retrieval")
 
 # Conditional edge from replanner: check if question can be answered
 graph_builder.add_conditional_edges(
@@ -92,4 +88,7 @@ graph_builder.add_edge("answer", "replanner")
 #     {"hallucination": "answer", "grounded on context": "replanner"},
 # )
 
-graph = graph_builder.compile()
+# Compiled once at import and shared by every caller; never compile per request.
+# Persistence is left to the LangGraph server, which injects its own checkpointer.
+GRAPH = graph_builder.compile()
+graph = GRAPH  # Name referenced by langgraph.json
@@ -0,0 +1,128 @@
+"""Bound the size of gathered context before it is prefilled into prompts."""
+
+import re
+from functools import lru_cache
+from typing import List
+
+from langchain_core.output_parsers import StrOutputParser
+
+from agent.utils.llm_cache import LLMCache, cached_ainvoke
+from agent.utils.llm_client import NUM_CTX, NUM_PREDICT, get_text_llm
+from agent.utils.prompts import (
+    chat_prompt,
+    keep_only_relevant_content_prompt_template,
+    summarize_context_prompt_template,
+)
+
+_CHARS_PER_TOKEN = 4  # Rough average for English text
+# Headroom for the chat template, the question and estimation error
+_PROMPT_MARGIN_TOKENS = 128
+
+# Leaves room for instructions and the answer within the model's 2048-token window
+MAX_CONTEXT_TOKENS = 1000
+# Retrieved documents sent to the fused filter and grounding check get what the
+# context window leaves after that prompt's instructions and its reply
+MAX_RETRIEVED_TOKENS = (
+    NUM_CTX
+    - NUM_PREDICT
+    - len(keep_only_relevant_content_prompt_template) // _CHARS_PER_TOKEN
+    - _PROMPT_MARGIN_TOKENS
+)
+
+_WORD_RE = re.compile(r"\w+")
+
+# Summaries are keyed on the exact context they replace, so every node that
+# sees the same aggregated context shares one summarization call
+_summary_cache = LLMCache()
+
+
+@lru_cache(maxsize=1)
+def _summary_chain():
+    return (
+        chat_prompt(summarize_context_prompt_template)
+        | get_text_llm()
+        | StrOutputParser()
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of text without loading a tokenizer."""
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _terms(text: str) -> set:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def select_by_overlap(
+    texts: List[str], query: str, max_tokens: int = MAX_RETRIEVED_TOKENS
+) -> List[str]:
+    """Keep the texts sharing the most terms with the query, within a token budget.
+
+    Texts are ranked by how many distinct query terms they contain and taken
+    greedily until the budget is spent; texts sharing no term are dropped once
+    at least one text is kept. The kept texts stay in their original order.
+
+    Args:
+        texts: Candidate texts, e.g. retrieved documents in search-rank order.
+        query: Text to score the candidates against.
+        max_tokens: Approximate token budget for the kept texts together.
+
+    Returns:
+        The selected texts.
+    """
+    if estimate_tokens(" ".join(texts)) <= max_tokens:
+        return texts
+
+    query_terms = _terms(query)
+    scores = [len(query_terms & _terms(text)) for text in texts]
+    # Ties keep the search ranking, since sorted() is stable
+    ranked = sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)
+
+    kept = set()
+    budget = max_tokens
+    for i in ranked:
+        if kept and scores[i] == 0:
+            break
+        cost = estimate_tokens(texts[i])
+        if cost > budget:
+            continue
+        kept.add(i)
+        budget -= cost
+    return [text for i, text in enumerate(texts) if i in kept]
+
+
+async def compress_context(
+    context: List[str], max_tokens: int = MAX_CONTEXT_TOKENS
+) -> str:
+    """Join context items, summarizing the oldest ones if they exceed the budget.
+
+    The most recent items are kept verbatim while they fit in half the budget;
+    everything older is replaced by a single LLM-written summary paragraph.
+
+    Args:
+        context: Context gathered by executed steps, oldest first.
+        max_tokens: Approximate token budget for the returned string.
+
+    Returns:
+        The context as one prompt string.
+    """
+    items = [c for c in context if c and c.strip()]
+    joined = "\n\n".join(items)
+    if estimate_tokens(joined) <= max_tokens:
+        return joined
+
+    recent: List[str] = []
+    budget = max_tokens // 2
+    for item in reversed(items):
+        cost = estimate_tokens(item)
+        if cost > budget:
+            break
+        recent.insert(0, item)
+        budget -= cost
+
+    older = "\n\n".join(items[: len(items) - len(recent)])
+    summary = await cached_ainvoke(_summary_chain(), {"context": older}, _summary_cache)
+    # The summary itself must also fit in the half of the budget left for it
+    summary = summary.strip()[: (max_tokens // 2) * _CHARS_PER_TOKEN]
+    return "\n\n".join([f"[Prior context summary]: {summary}", *recent])
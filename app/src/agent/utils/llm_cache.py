@@ -0,0 +1,74 @@
+"""In-memory exact-match cache for LLM chain invocations."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+
+
+class LLMCache:
+    """Bounded LRU mapping from canonicalized chain inputs to chain outputs."""
+
+    def __init__(self, maxsize: int = 512):
+        """Create an empty cache holding at most maxsize outputs."""
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()  # Graph nodes may run on worker threads
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached output for a key, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: str, value: Any) -> None:
+        """Store an output, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached outputs."""
+        with self._lock:
+            self._entries.clear()
+
+
+def make_cache_key(key_dict: Dict[str, Any]) -> str:
+    """Hash chain inputs into a stable key, independent of dict ordering."""
+    payload = orjson.dumps(key_dict, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def cached_invoke(chain, key_dict: Dict[str, Any], cache: LLMCache) -> Any:
+    """Invoke a chain, returning the cached output when the same inputs recur.
+
+    Args:
+        chain: Runnable to invoke on a cache miss.
+        key_dict: Inputs passed to the chain; also the cache key.
+        cache: Cache owned by the calling node, so chains never share entries.
+
+    Returns:
+        The chain output.
+    """
+    key = make_cache_key(key_dict)
+    result = cache.get(key)
+    if result is None:
+        result = chain.invoke(key_dict)
+        cache.put(key, result)
+    return result
+
+
+async def cached_ainvoke(chain, key_dict: Dict[str, Any], cache: LLMCache) -> Any:
+    """Async variant of cached_invoke."""
+    key = make_cache_key(key_dict)
+    result = cache.get(key)
+    if result is None:
+        result = await chain.ainvoke(key_dict)
+        cache.put(key, result)
+    return result
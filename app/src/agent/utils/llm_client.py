@@ -0,0 +1,90 @@
+"""Shared Ollama chat model used by every agent node."""
+
+import os
+from functools import cache, lru_cache
+
+# Shared with agent.utils.context, which sizes prompt budgets from the window
+NUM_CTX = 2048  # Reduced context window
+NUM_PREDICT = 512  # Output token limit
+
+
+@lru_cache(maxsize=1)
+def get_llm():
+    """Return the chat model shared by every node, creating it on first use.
+
+    All nodes and their structured-output bindings share this model, so every
+    call reuses one pooled HTTP connection set instead of each module opening
+    its own. The Ollama client is imported here rather than at module load so
+    importing the graph stays cheap for one-shot CLI runs.
+    """
+    import httpx
+    from langchain_community.cache import SQLiteCache
+    from langchain_ollama import ChatOllama
+
+    # Ollama reads a bare number as seconds but a string as a Go duration ("30m")
+    keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+    if keep_alive.lstrip("-").isdigit():
+        keep_alive = int(keep_alive)
+
+    return ChatOllama(
+        # Persist prompt -> reply pairs so identical calls skip inference, even
+        # across restarts; keys include the bound format, so nodes never collide
+        cache=SQLiteCache(os.getenv("LLM_CACHE_PATH", ".agent_cache.db")),
+        # The llama3.1:8b tag is the Q4_K_M quantization; set e.g.
+        # llama3.1:8b-instruct-q8_0 where memory bandwidth allows
+        model=os.getenv("OLLAMA_MODEL", "llama3.1:8b"),
+        # .env is parsed once by config.py, which agent.utils.tools imports
+        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+        # Keep the model resident between calls (-1 = never unload) so a pause
+        # between questions does not pay for reloading the weights
+        keep_alive=keep_alive,
+        temperature=0.1,  # Slightly higher for faster sampling
+        num_predict=NUM_PREDICT,
+        num_ctx=NUM_CTX,
+        format="json",  # Force JSON output; structured calls bind a JSON schema instead
+        # Keep connections alive across calls; parallel plan steps fan out requests
+        client_kwargs={
+            "limits": httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        },
+    )
+
+
+@lru_cache(maxsize=1)
+def get_text_llm():
+    """Return a free-text variant of the shared model for streamed answers."""
+    return get_llm().bind(format="")
+
+
+@lru_cache(maxsize=1)
+def get_judge_llm():
+    """Return a variant of the shared model for short yes/no judgments.
+
+    Judge schemas hold a single boolean, so the format grammar closes the JSON
+    object within about ten tokens and the decode budget only needs headroom
+    above that. num_ctx is left unchanged: Ollama reloads the model whenever a
+    request asks for a different context size.
+    """
+    # model_copy keeps the shared HTTP clients and cache
+    return get_llm().model_copy(update={"num_predict": 32, "temperature": 0.0})
+
+
+@cache
+def get_structured_llm(schema, judge: bool = False):
+    """Return the shared model bound to a pydantic output schema.
+
+    The schema is passed as Ollama's format grammar, so the reply is always
+    valid JSON for it and is validated straight from the raw string by
+    pydantic-core in one call, without an intermediate dict. Building the JSON
+    schema walks the model, so it is done once per schema class and the bound
+    runnable is reused by every chain and call.
+
+    Args:
+        schema: Pydantic model the reply must match.
+        judge: Use the short-output judge model instead of the default one.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    model = get_judge_llm() if judge else get_llm()
+    return model.bind(format=schema.model_json_schema()) | RunnableLambda(
+        lambda message: schema.model_validate_json(message.content)
+    )
@@ -1,184 +1,409 @@
 """Node implementations for the LangGraph agent."""
 
-from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_ollama import ChatOllama
-
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import orjson
+from langchain_core.output_parsers import StrOutputParser
+from langgraph.types import Command, Send
+
+from agent.utils.context import compress_context
+from agent.utils.llm_cache import LLMCache, cached_ainvoke
+from agent.utils.llm_client import get_structured_llm, get_text_llm
 from agent.utils.prompts import (
     break_down_plan_prompt_template,
+    chat_prompt,
     final_answer_prompt_template,
     planner_prompt,
+    question_answer_batch_prompt_template,
     question_answer_cot_prompt_template,
     replanner_prompt,
-    tasks_handler_prompt_template,
+    tasks_handler_batch_prompt_template,
 )
+from agent.utils.semantic_cache import SemanticCache
 from agent.utils.state import (
     ActPossibleResults,
-    FinalAnswer,
+    AnswerStepsState,
     Input,
     Plan,
     PlanExecute,
+    QuestionAnswerBatch,
     QuestionAnswerFromContext,
-    TaskHandlerOutput,
+    TaskHandlerBatch,
 )
+from agent.utils.tools import embedder
+
+# One exact-match cache per chain so identical inputs skip the LLM roundtrip
+_planner_cache = LLMCache()
+_breakdown_cache = LLMCache()
+_replanner_cache = LLMCache()
+_task_handler_cache = LLMCache()
+_answer_cache = LLMCache()
+_final_answer_cache = LLMCache()
+
+# Paraphrased questions reuse plans and answers; answers only match within the
+# same context, so a cached answer is never served for different evidence.
+# Both persist to one SQLite file so a restarted server keeps its earlier hits.
+_SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "semantic_cache.db")
+
+
+# Opened on first use like the chains below, so importing the graph never
+# creates or reads the SQLite file
+@lru_cache(maxsize=1)
+def _planner_semantic_cache() -> SemanticCache:
+    return SemanticCache(
+        embedder, path=_SEMANTIC_CACHE_PATH, name="planner", schema=Plan
+    )
+
+
+@lru_cache(maxsize=1)
+def _answer_semantic_cache() -> SemanticCache:
+    return SemanticCache(
+        embedder,
+        path=_SEMANTIC_CACHE_PATH,
+        name="answer",
+        schema=QuestionAnswerFromContext,
+    )
 
-load_dotenv()
 
-# Optimized LLM configuration for faster inference
-llm = ChatOllama(
-    model="llama3.1:8b",
-    temperature=0.1,  # Slightly higher for faster sampling
-    num_predict=512,  # Limit output tokens
-    num_ctx=2048,  # Reduce context window
-    format="json",  # Force JSON output mode
+# Canonical step shapes requested by break_down_plan_prompt_template; steps
+# matching one are routed without asking the LLM. Group 1 is the search/question.
+_STEP_PATTERNS = (
+    (
+        re.compile(
+            r"^retrieve\s+(?:\w+\s+(?:about|on|regarding)\s+)?(.+?)\s+"
+            r"from\s+(?:the\s+)?book\s+chunks",
+            re.IGNORECASE,
+        ),
+        "retrieve_chunks",
+    ),
+    (
+        re.compile(
+            r"^retrieve\s+(?:\w+\s+(?:about|on|regarding)\s+)?(.+?)\s+"
+            r"from\s+(?:the\s+)?quotes",
+            re.IGNORECASE,
+        ),
+        "retrieve_quotes",
+    ),
+    (
+        re.compile(
+            r"^answer\s+(?:the\s+)?(?:question\s+)?(.+?)\s+"
+            r"from\s+(?:the\s+)?(?:existing\s+)?context",
+            re.IGNORECASE,
+        ),
+        "answer_from_context",
+    ),
 )
 
 
-def planner_node(state: Input) -> dict:
-    """Generate initial plan from user question."""
-    planner_prompt_template = ChatPromptTemplate.from_template(planner_prompt)
-    planner_chain = planner_prompt_template | llm.with_structured_output(
-        Plan, method="json_mode"
+# Retrieval steps naming both databases, e.g. "... from book chunks and quotes".
+# Only the source clause is matched, so a subject such as "Hagrid's quotes" in
+# "Retrieve Hagrid's quotes from the book chunks" stays a single-source step.
+_MULTI_SOURCE_RE = re.compile(
+    r"\bfrom\s+(?:both\s+)?(?:the\s+)?"
+    r"(?:book\s+chunks\s+and\s+(?:the\s+)?quotes"
+    r"|quotes\s+and\s+(?:the\s+)?book\s+chunks)\b",
+    re.IGNORECASE,
+)
+
+
+# Chains are built on first use and then reused: prompt -> LLM -> structured
+# output. json_schema passes each model's schema as Ollama's format grammar, so
+# decoding can only emit valid output and no parse-failure re-prompt is needed.
+# Deferring construction keeps the Ollama client import off the cold-start path.
+@lru_cache(maxsize=1)
+def _planner_chain():
+    return _planner_semantic_cache().wrap(
+        chat_prompt(planner_prompt) | get_structured_llm(Plan),
+        "question",
     )
 
-    plan_result = planner_chain.invoke({"question": state.question})
+
+@lru_cache(maxsize=1)
+def _breakdown_chain():
+    return chat_prompt(break_down_plan_prompt_template) | get_structured_llm(Plan)
+
+
+@lru_cache(maxsize=1)
+def _replanner_chain():
+    return chat_prompt(replanner_prompt) | get_structured_llm(ActPossibleResults)
+
+
+@lru_cache(maxsize=1)
+def _task_handler_chain():
+    return chat_prompt(tasks_handler_batch_prompt_template) | get_structured_llm(
+        TaskHandlerBatch
+    )
+
+
+@lru_cache(maxsize=1)
+def _qa_cot_chain():
+    return _answer_semantic_cache().wrap(
+        chat_prompt(question_answer_cot_prompt_template)
+        | get_structured_llm(QuestionAnswerFromContext),
+        "question",
+        scope_key="context",
+    )
+
+
+@lru_cache(maxsize=1)
+def _qa_batch_chain():
+    return chat_prompt(question_answer_batch_prompt_template) | get_structured_llm(
+        QuestionAnswerBatch
+    )
+
+
+@lru_cache(maxsize=1)
+def _final_answer_chain():
+    # The final answer is plain text so its tokens can be streamed as they decode
+    return (
+        chat_prompt(final_answer_prompt_template) | get_text_llm() | StrOutputParser()
+    )
+
+
+def _to_json(value) -> str:
+    """Serialize a list of steps for interpolation into a prompt."""
+    return orjson.dumps(value).decode()
+
+
+async def planner_node(state: Input) -> dict:
+    """Generate initial plan from user question."""
+    plan_result = await cached_ainvoke(
+        _planner_chain(),
+        {"question": state["question"]},
+        _planner_cache,
+    )
 
     return {
-        "question": state.question,
+        "question": state["question"],
         "plan": plan_result.steps,
     }
 
 
-def break_down_plan_node(state: PlanExecute) -> dict:
+async def break_down_plan_node(state: PlanExecute) -> dict:
     """Refine plan to make steps executable by retrieval or QA."""
-    breakdown_prompt_template = ChatPromptTemplate.from_template(
-        break_down_plan_prompt_template
-    )
-    breakdown_chain = breakdown_prompt_template | llm.with_structured_output(
-        Plan, method="json_mode"
+    refined_plan_result = await cached_ainvoke(
+        _breakdown_chain(), {"plan": _to_json(state.get("plan", []))}, _breakdown_cache
     )
 
-    refined_plan_result = breakdown_chain.invoke({"plan": state.plan})
-
     return {"plan": refined_plan_result.steps}
 
 
-def replanner_node(state: PlanExecute) -> dict:
+async def replanner_node(state: PlanExecute) -> dict:
     """Update plan based on past steps and context."""
-    replanner_prompt_template = ChatPromptTemplate.from_template(replanner_prompt)
-    replanner_chain = replanner_prompt_template | llm.with_structured_output(
-        ActPossibleResults, method="json_mode"
+    # Context from every executed step is already appended by the state reducer
+    result = await cached_ainvoke(
+        _replanner_chain(),
+        {
+            "question": state["question"],
+            "plan": _to_json(state.get("plan", [])),
+            "past_steps": _to_json(state.get("past_steps", [])),
+            "aggregated_context": await compress_context(
+                state.get("aggregated_context", [])
+            ),
+        },
+        _replanner_cache,
     )
 
-    # Accumulate context from retrieval steps
-    new_aggregated_context = state.aggregated_context
-    if state.context and state.context.strip():
-        if new_aggregated_context:
-            new_aggregated_context += "\n\n" + state.context
-        else:
-            new_aggregated_context = state.context
-
-    # Also accumulate relevant_context if available (from retrieval workflows)
-    if (
-        hasattr(state, "relevant_context")
-        and state.relevant_context
-        and state.relevant_context.strip()
-    ):
-        if new_aggregated_context:
-            new_aggregated_context += "\n\n" + state.relevant_context
-        else:
-            new_aggregated_context = state.relevant_context
-
-    result = replanner_chain.invoke(
+    return {"plan": result.plan.steps}
+
+
+# Node that runs each tool the task handler can select
+_ROUTE = {
+    "retrieve_chunks": "retrieve_chunks",
+    "retrieve_quotes": "retrieve_quotes",
+    "answer_from_context": "answer",
+}
+
+
+def route_based_on_tool(tool: str) -> str:
+    """Map the tool selected by the task handler to the node that runs it."""
+    # Unrecognized tool names fall back to answering from existing context
+    return _ROUTE.get(tool, "answer")
+
+
+def classify_step(step: str) -> Optional[Tuple[str, str]]:
+    """Return (query, tool) for a step in a canonical shape, or None if ambiguous."""
+    for pattern, tool in _STEP_PATTERNS:
+        match = pattern.match(step.strip())
+        if match:
+            return match.group(1), tool
+    return None
+
+
+def names_both_sources(step: str) -> bool:
+    """Return whether a retrieval step asks for both the book chunks and quotes."""
+    return _MULTI_SOURCE_RE.search(step) is not None
+
+
+def _answer_send(
+    state: PlanExecute, tasks: List[str], queries: List[str], context: str
+) -> Send:
+    """Send the steps answered from existing context to the answer node together.
+
+    Only called once no retrieval of the round is still running, so the batch
+    snapshot of the context already holds everything the steps can use.
+    """
+    # Steps answered from existing context share it, so answer them in one call
+    return Send(
+        "answer",
         {
-            "question": state.question,
-            "plan": state.plan,
-            "past_steps": state.past_steps,
-            "aggregated_context": new_aggregated_context,
-        }
+            "question": state["question"],
+            "curr_tasks": tasks,
+            "queries": queries,
+            "aggregated_context": context,
+        },
     )
 
-    return {
-        "plan": result.plan.steps,
-        "aggregated_context": new_aggregated_context,
-    }
 
+async def task_handler_node(state: PlanExecute) -> Command:
+    """Decide the tool for every plan step and send the retrieval steps to it.
 
-def task_handler_node(state: PlanExecute) -> dict:
-    """Decide which tool to use for the current task."""
-    task_handler_prompt_template = ChatPromptTemplate.from_template(
-        tasks_handler_prompt_template
-    )
-    task_handler_chain = task_handler_prompt_template | llm.with_structured_output(
-        TaskHandlerOutput, method="json_mode"
+    Steps in a canonical shape are routed by pattern; the rest are decided
+    together in one LLM call. Retrieval steps run in parallel, and those that
+    name both the chunks and quotes databases are sent to both workflows at
+    once. Steps answered from existing context usually depend on those
+    retrievals, so they are held in state and dispatched by
+    answer_after_retrieval_node once the retrievals have merged.
+    """
+    steps = state.get("plan") or [state["question"]]
+    decisions: List[Optional[Tuple[str, str]]] = [classify_step(s) for s in steps]
+
+    ambiguous = [step for step, decision in zip(steps, decisions) if decision is None]
+    if ambiguous:
+        # One request amortizes the instruction prefill across the remaining steps
+        labels = [f"task{n}" for n in range(1, len(ambiguous) + 1)]
+        result = await cached_ainvoke(
+            _task_handler_chain(),
+            {"tasks": _to_json(dict(zip(labels, ambiguous)))},
+            _task_handler_cache,
+        )
+        # Match decisions by label so a skipped task cannot shift the rest;
+        # unlabeled decisions are taken in order
+        by_label = {d.task: d for d in result.decisions if d.task in labels}
+        unlabeled = iter(d for d in result.decisions if d.task not in by_label)
+        pending = iter(labels)
+        for i, decision in enumerate(decisions):
+            if decision is None:
+                # Fall back to searching chunks for the step if a decision is missing
+                llm_decision = by_label.get(next(pending)) or next(unlabeled, None)
+                decisions[i] = (
+                    (llm_decision.query, llm_decision.tool)
+                    if llm_decision is not None
+                    else (steps[i], "retrieve_chunks")
+                )
+
+    aggregated_context = await compress_context(state.get("aggregated_context", []))
+    sends = []
+    answer_tasks, answer_queries = [], []
+    for step, (query, tool) in zip(steps, decisions):
+        node = route_based_on_tool(tool)
+        if node == "answer":
+            answer_tasks.append(step)
+            answer_queries.append(query or step)
+            continue
+
+        # A step asking for both sources searches them in parallel branches
+        nodes = (
+            ("retrieve_chunks", "retrieve_quotes")
+            if names_both_sources(step)
+            else (node,)
+        )
+        sends.extend(
+            Send(
+                target,
+                {
+                    "question": state["question"],
+                    "curr_task": step,
+                    "query": query or step,
+                    "aggregated_context": aggregated_context,
+                },
+            )
+            for target in nodes
+        )
+
+    # With nothing to retrieve, the existing context is final for this round
+    if not sends:
+        return Command(
+            update={"answer_tasks": [], "answer_queries": []},
+            goto=[
+                _answer_send(state, answer_tasks, answer_queries, aggregated_context)
+            ],
+        )
+
+    # Route inside the node; a conditional edge could not attach per-step state
+    return Command(
+        update={"answer_tasks": answer_tasks, "answer_queries": answer_queries},
+        goto=sends,
     )
 
-    # Get current task (first item in plan)
-    curr_task = state.plan[0] if state.plan else ""
 
-    result = task_handler_chain.invoke(
-        {
-            "curr_task": curr_task,
-            "last_tool": state.tool,
-        }
+async def answer_after_retrieval_node(state: PlanExecute) -> Command:
+    """Answer the held-back steps from the context the retrievals just merged.
+
+    Runs once after every retrieval branch of the round has finished; without
+    held-back steps it goes straight to the replanner.
+    """
+    answer_tasks = state.get("answer_tasks") or []
+    if not answer_tasks:
+        return Command(goto="replanner")
+
+    aggregated_context = await compress_context(state.get("aggregated_context", []))
+    return Command(
+        update={"answer_tasks": [], "answer_queries": []},
+        goto=[
+            _answer_send(
+                state,
+                answer_tasks,
+                state.get("answer_queries") or answer_tasks,
+                aggregated_context,
+            )
+        ],
     )
 
-    return {
-        "query_to_retrieve_or_answer": result.query,
-        "curr_context": result.curr_context,
-        "tool": result.tool,
-    }
 
+async def answer_question_from_context_node(state: AnswerStepsState) -> dict:
+    """Answers the plan steps' questions from the gathered context.
 
-def answer_question_from_context_node(state: PlanExecute):
-    """Answers a question from a given context using a chain-of-thought LLM chain.
+    A single question uses the chain-of-thought prompt; several questions that
+    share the context are answered together in one LLM call.
 
     Args:
-        state (dict): A dictionary containing:
-            - "question": The query question.
-            - "context": The context to answer the question from.
-            - Optionally, "aggregated_context": an aggregated context to use instead.
+        state: An AnswerStepsState containing:
+            - "queries": The questions chosen by the task handler.
+            - "curr_tasks": The plan steps being executed.
+            - "aggregated_context": The context gathered so far, including
+              every retrieval of the current round.
 
     Returns:
         dict: A dictionary with:
-            - "answer": The generated answer.
-            - "context": The context used.
-            - "question": The original question.
+            - "aggregated_context": The generated answers, appended to the shared context.
+            - "past_steps": The executed steps.
     """
-    # Extract the question from the state
-    question = state.question if hasattr(state, "question") else state["question"]
-    # Use "aggregated_context" if present, otherwise use "context"
-    if hasattr(state, "aggregated_context"):
-        context = (
-            state.aggregated_context if state.aggregated_context else state.context
-        )
-    elif hasattr(state, "context"):
-        context = state.context
-    else:
-        # Fallback for dict-style state
-        context = state.get("aggregated_context", "") or state.get("context", "")
+    queries = state["queries"]
+    context = state["aggregated_context"]
 
-    input_data = {"question": question, "context": context}
+    if len(queries) == 1:
+        input_data = {"question": queries[0], "context": context}
 
-    question_answer_from_context_cot_prompt = PromptTemplate(
-        template=question_answer_cot_prompt_template,  # Uses examples and instructions for step-by-step reasoning
-        input_variables=[
-            "context",
-            "question",
-        ],  # Expects 'context' and 'question' as inputs
-    )
-    question_answer_from_context_cot_chain = (
-        question_answer_from_context_cot_prompt
-        | llm.with_structured_output(QuestionAnswerFromContext, method="json_mode")
-    )
-    # Invoke the chain-of-thought LLM chain to generate an answer
-    output = question_answer_from_context_cot_chain.invoke(input_data)
-    answer = output.answer_based_on_content
-    # Return the answer, context, and question in a dictionary
-    return {"answer": answer, "context": context, "question": question}
+        # Invoke the chain-of-thought LLM chain to generate an answer
+        output = await cached_ainvoke(_qa_cot_chain(), input_data, _answer_cache)
+        answers = [output.answer_based_on_content]
+    else:
+        output = await cached_ainvoke(
+            _qa_batch_chain(),
+            {"questions": _to_json(queries), "context": context},
+            _answer_cache,
+        )
+        answers = output.answers
+
+    # Return the answers as new context for the replanner and final answer
+    return {"aggregated_context": answers, "past_steps": state["curr_tasks"]}
 
 
-def get_final_answer_node(state: PlanExecute) -> dict:
+async def get_final_answer_node(state: PlanExecute) -> dict:
     """Synthesize all gathered evidence into a comprehensive final answer.
 
     Args:
@@ -191,9 +416,9 @@ def get_final_answer_node(state: PlanExecute) -> dict:
         dict: A dictionary with:
             - "response": The final synthesized answer.
     """
-    question = state.question
-    aggregated_context = state.aggregated_context
-    past_steps = state.past_steps
+    question = state["question"]
+    aggregated_context = await compress_context(state.get("aggregated_context", []))
+    past_steps = _to_json(state.get("past_steps", []))
 
     # Prepare input for the final answer chain
     input_data = {
@@ -202,16 +427,12 @@ def get_final_answer_node(state: PlanExecute) -> dict:
         "past_steps": past_steps,
     }
 
-    # Create the prompt template for final answer synthesis
-    final_answer_prompt = ChatPromptTemplate.from_template(final_answer_prompt_template)
-
-    # Build the chain: prompt -> LLM -> structured output
-    final_answer_chain = final_answer_prompt | llm.with_structured_output(
-        FinalAnswer, method="json_mode"
+    # ainvoke (not astream) goes through the model's SQLiteCache, so the answer
+    # persists across restarts; under graph.astream_events or
+    # stream_mode="messages" the model still streams tokens to those callers
+    output = await cached_ainvoke(
+        _final_answer_chain(), input_data, _final_answer_cache
     )
-
-    # Invoke the chain to synthesize the final answer
-    output = final_answer_chain.invoke(input_data)
-    final_response = output.final_answer
+    final_response = output.strip()
 
     return {"response": final_response}
@@ -1,6 +1,39 @@
-"""Prompt templates for the LangGraph agent."""
+"""Prompt templates for the LangGraph agent.
 
-planner_prompt = """Create a concise step-by-step plan to answer: {question}
+Every template keeps its static instructions and examples first and the
+per-call variables last, below an INPUTS_MARKER line, so consecutive calls
+share a token prefix that the model server can reuse from its KV cache instead
+of re-encoding. chat_prompt() sends the two parts as system and human messages.
+"""
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+
+INPUTS_MARKER = "--- INPUTS ---\n"
+
+
+def static_prefix(template: str) -> str:
+    """Return the variable-free instructions of a template, rendered as sent."""
+    return template.split(INPUTS_MARKER, 1)[0].strip().format()  # Unescape {{ }}
+
+
+def chat_prompt(template: str) -> RunnableLambda:
+    """Build a runnable rendering a template as system and human messages.
+
+    The text before INPUTS_MARKER holds no variables, so it is rendered once
+    into a shared system message; each call only fills the human message with
+    str.format_map instead of re-walking a ChatPromptTemplate.
+    """
+    system = SystemMessage(static_prefix(template))
+    human = template.split(INPUTS_MARKER, 1)[1].strip()
+
+    def render(variables: dict) -> list:
+        return [system, HumanMessage(human.format_map(variables))]
+
+    return RunnableLambda(render)
+
+
+planner_prompt = """Create a concise step-by-step plan to answer the question below.
 
 Requirements:
 - List only essential steps
@@ -18,10 +51,13 @@ Respond ONLY with valid JSON in this EXACT format:
 }}
 
 IMPORTANT: Each step must be a STRING, not an object. Do NOT use {{"step": "...", "description": "..."}}.
+
+--- INPUTS ---
+Question: {question}
 """
 
 
-break_down_plan_prompt_template = """Refine this plan: {plan}
+break_down_plan_prompt_template = """Refine the plan below.
 
 Each step must use ONE of:
 1. Retrieve from book chunks database
@@ -40,14 +76,13 @@ Respond ONLY with JSON in this EXACT format:
 }}
 
 IMPORTANT: Each step must be a STRING, not an object. Do NOT use {{"step": "...", "description": "..."}}.
+
+--- INPUTS ---
+Plan: {plan}
 """
 
 
-replanner_prompt = """Update the plan to answer: {question}
-
-Original plan: {plan}
-Completed steps: {past_steps}
-Current context: {aggregated_context}
+replanner_prompt = """Update the plan to answer the question below.
 
 Provide ONLY remaining steps needed (never empty). Exclude completed steps.
 
@@ -63,134 +98,103 @@ Respond ONLY with JSON in this EXACT format:
 }}
 
 IMPORTANT: Each step must be a STRING, not an object. Do NOT use {{"step": "...", "description": "..."}}.
-"""
 
-tasks_handler_prompt_template = """
-Task: {curr_task}
+--- INPUTS ---
+Question: {question}
+Original plan: {plan}
+Completed steps: {past_steps}
+Current context: {aggregated_context}
+"""
 
-Select tool:
+tasks_handler_batch_prompt_template = """
+Select a tool for EACH task in the list below:
 1. "retrieve_chunks" - Search book chapters/sections
 2. "retrieve_quotes" - Search book quotes
 3. "answer_from_context" - Use existing context
 
-Last tool: {last_tool}
-(Avoid using same tool twice in a row)
+Tasks are labeled task1, task2, ... Return exactly one decision per task,
+in the same order, each carrying its task label.
 
 JSON format:
-{{"query": "search text", "curr_context": "", "tool": "retrieve_chunks"}}
+{{"decisions": [{{"task": "task1", "query": "search text", "curr_context": "", "tool": "retrieve_chunks"}}]}}
+
+--- INPUTS ---
+Tasks: {tasks}
 """
 
 keep_only_relevant_content_prompt_template = """
-Query: {query}
-Documents: {retrieved_documents}
-
-Filter out irrelevant information. Keep only text relevant to the query.
+Filter out irrelevant information from the documents below. Keep only text relevant to the query.
 Do NOT add new information.
+Set grounded to true only if every claim in relevant_content appears in the documents.
 
-JSON: {{"relevant_content": "filtered text"}}
-"""
-# Prompt template for checking if distilled content is grounded in the original context
-is_distilled_content_grounded_on_content_prompt_template = """
-Determine if the distilled content is grounded in the original context.
+JSON: {{"relevant_content": "filtered text", "grounded": true}}
 
-Distilled Content: {distilled_content}
+--- INPUTS ---
+Query: {query}
+Documents: {retrieved_documents}
+"""
 
-Original Context: {original_context}
+question_answer_cot_prompt_template = """
+Answer the question using only the context below.
+Reason step by step over the facts the context states, e.g. "A > B, B = C, so A > C".
+If the context does not contain the answer, say there is not enough context.
 
-IMPORTANT: Respond ONLY with valid JSON in this exact format:
-{{
-  "grounded": true,
-  "explanation": "your explanation here"
-}}
+Respond ONLY with JSON: {{"answer_based_on_content": "your answer here"}}
 
-Do NOT write code, do NOT add any text outside the JSON. Just the JSON object.
+--- INPUTS ---
+Context:
+{context}
+Question:
+{question}
 """
+question_answer_batch_prompt_template = """
+Answer EACH question below using only the given context.
+If the context does not contain the answer, say there is not enough context.
+Return exactly one answer per question, in the same order as the questions.
 
-question_answer_cot_prompt_template = """ 
-Chain-of-Thought Reasoning Examples
-
-Example 1  
-Context: Mary is taller than Jane. Jane is shorter than Tom. Tom is the same height as David.  
-Question: Who is the tallest person?  
-Reasoning:  
-Mary > Jane  
-Jane < Tom → Tom > Jane  
-Tom = David  
-So: Mary > Tom = David > Jane  
-Final Answer: Mary  
-
-Example 2  
-Context: Harry read about three spells—one turns people into animals, one levitates objects, and one creates light.  
-Question: If Harry cast these spells, what could he do?  
-Reasoning:  
-Spell 1: transform people into animals  
-Spell 2: levitate things  
-Spell 3: make light  
-Final Answer: He could transform people, levitate objects, and create light  
-
-Example 3  
-Context: Harry Potter got a Nimbus 2000 broomstick for his birthday.  
-Question: Why did Harry receive a broomstick?  
-Reasoning:  
-The context says he received a broomstick  
-It doesn’t explain why or who gave it  
-No info on hobbies or purpose  
-Final Answer: Not enough context to know why he received it  
-
-Now, follow the same pattern below.
-
-Context:  
-{context}  
-Question:  
-{question}
+Respond ONLY with JSON: {{"answers": ["answer to question 1", "answer to question 2"]}}
 
-Respond ONLY with JSON: {{"answer_based_on_content": "your answer here"}}
+--- INPUTS ---
+Context:
+{context}
+Questions:
+{questions}
 """
-is_grounded_on_facts_prompt_template = """Is this answer grounded in the context?
+is_grounded_on_facts_prompt_template = """Is every claim in the answer supported by the context?
+
+JSON: {{"grounded_on_facts": true}}
 
+--- INPUTS ---
 Context: {context}
 Answer: {answer}
-
-Respond ONLY with valid JSON:
-{{"grounded_on_facts": true}} or {{"grounded_on_facts": false}}
-
-No code, no explanation, just JSON.
 """
 
-can_be_answered_prompt_template = """Determine if the question can be satisfactorily answered using the provided context.
+can_be_answered_prompt_template = """Can the question be answered from the context?
+Answer true if the context has ANY relevant information, even if incomplete.
+Answer false only if the context is empty or unrelated.
 
+JSON: {{"can_be_answered": true}}
+
+--- INPUTS ---
 Question: {question}
 
 Available Context:
 {context}
+"""
 
-Evaluation Criteria:
-- Does the context contain relevant information to answer the question?
-- Can a reasonable answer be formed from this context?
-- If the context has SOME useful information (even if not complete), answer 'true'
-- Only answer 'false' if the context is empty or completely unrelated
-
-IMPORTANT: Be generous in evaluation. If you have gathered ANY relevant context that helps answer the question, return true.
+summarize_context_prompt_template = """Summarize the context below into one dense paragraph.
+Keep every name, place, event and quote that could answer a question about it.
+Do NOT add new information.
 
-Respond ONLY with valid JSON in this format:
-{{
-  "can_be_answered": true,
-  "explanation": "brief explanation"
-}}
+Respond with the summary text only: no JSON, no preamble.
 
-No code, just JSON.
+--- INPUTS ---
+Context:
+{context}
 """
 
 final_answer_prompt_template = """You are an expert at providing precise, complete answers based on gathered evidence.
 
-Original Question: {question}
-
-Aggregated Context and Evidence:
-{aggregated_context}
-
-Past Steps Taken:
-{past_steps}
-
 Instructions:
 1. Answer the question DIRECTLY and SPECIFICALLY - include all relevant details (names, places, events, etc.)
 2. If the question asks "what", "who", "where", or "when" - provide the specific answer immediately
@@ -204,7 +208,14 @@ Question: "What class does Professor McGonagall teach?"
 Good: "Professor McGonagall teaches Transfiguration at Hogwarts."
 Bad: "Professor McGonagall is teaching a class."
 
-Respond ONLY with JSON: {{"final_answer": "your direct and complete answer here"}}
+Respond with the answer text only: no JSON, no code, no preamble.
+
+--- INPUTS ---
+Original Question: {question}
+
+Aggregated Context and Evidence:
+{aggregated_context}
 
-No code, just JSON.
+Past Steps Taken:
+{past_steps}
 """
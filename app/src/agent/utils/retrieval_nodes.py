@@ -1,149 +1,178 @@
 """Retrieval workflow node implementations."""
 
-from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_ollama import ChatOllama
+import os
+import threading
+from functools import lru_cache
+from typing import List
 
+from langchain_core.documents import Document
+
+from agent.utils.context import select_by_overlap
+from agent.utils.llm_cache import LLMCache, cached_ainvoke
+from agent.utils.llm_client import get_llm, get_structured_llm
 from agent.utils.prompts import (
     can_be_answered_prompt_template,
-    is_distilled_content_grounded_on_content_prompt_template,
+    chat_prompt,
     is_grounded_on_facts_prompt_template,
     keep_only_relevant_content_prompt_template,
+    static_prefix,
 )
 from agent.utils.state import (
     CanBeAnswered,
+    DistilledAndGrounded,
     GroundedOnFacts,
-    IsDistilledContentGroundedOnContent,
-    KeepRelevantContent,
-    QualitativeRetrievalGraphState,
+    joined_context,
 )
 from agent.utils.tools import search_chunks, search_quotes
 
-load_dotenv()
+# Backslash-escapes both quote characters in a single pass over the text
+_ESCAPE_TABLE = str.maketrans({'"': '\\"', "'": "\\'"})
 
-# Optimized LLM configuration for faster inference
-llm = ChatOllama(
-    model="llama3.1:8b",
-    temperature=0.1,  # Slightly higher for faster sampling
-    num_predict=512,  # Limit output tokens
-    num_ctx=2048,  # Reduce context window
-    format="json",  # Force JSON output mode
-)
+# One exact-match cache per judge; their inputs recur across plan iterations
+_keep_relevant_cache = LLMCache()
+_is_grounded_cache = LLMCache()
+_can_be_answered_cache = LLMCache()
 
 
-def retrieve_book_quotes_context_per_question(state):
+# Judge chains are built on first use and reused by every call, so templates are
+# parsed and chains assembled once per process rather than once per node run
+@lru_cache(maxsize=1)
+def _keep_relevant_chain():
+    # Filtering and its grounding check share one prefill of the retrieved context
+    return chat_prompt(keep_only_relevant_content_prompt_template) | get_structured_llm(
+        DistilledAndGrounded
+    )
+
+
+@lru_cache(maxsize=1)
+def _is_grounded_chain():
+    return chat_prompt(is_grounded_on_facts_prompt_template) | get_structured_llm(
+        GroundedOnFacts, judge=True
+    )
+
+
+@lru_cache(maxsize=1)
+def _can_be_answered_chain():
+    return chat_prompt(can_be_answered_prompt_template) | get_structured_llm(
+        CanBeAnswered, judge=True
+    )
+
+
+def _warm_up_prefixes() -> None:
+    """Prefill each judge's static system prompt once so Ollama holds its KV.
+
+    Opt-in with OLLAMA_WARMUP=1, which runs it in a background thread at
+    import. Ollama keeps one cached prefix per parallel slot and the planner
+    calls run before any judge, so it only pays off on servers started with
+    OLLAMA_NUM_PARALLEL above one. A missing server only means the first
+    real calls pay the prefill, so errors are ignored.
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    # One decoded token, and no reply caching so the request reaches Ollama
+    llm = get_llm().model_copy(update={"num_predict": 1, "cache": False})
+    for template in (
+        keep_only_relevant_content_prompt_template,
+        is_grounded_on_facts_prompt_template,
+        can_be_answered_prompt_template,
+    ):
+        try:
+            llm.invoke(
+                [SystemMessage(static_prefix(template)), HumanMessage("[warmup]")]
+            )
+        except Exception:
+            return
+
+
+if os.getenv("OLLAMA_WARMUP", "0") == "1":
+    threading.Thread(target=_warm_up_prefixes, daemon=True).start()
+
+
+def _join_documents(docs: List[Document], question: str) -> str:
+    """Concatenate retrieved documents once each, escaping quotes in the kept ones.
+
+    Documents are deduplicated by the content hash stored at ingestion (or the
+    text itself when missing), so repeated hits are not paid for in prefill.
+    When they exceed the retrieval token budget, only those sharing the most
+    terms with the question are kept for the filter and grounding call.
+    """
+    seen = set()
+    parts = []
+    for doc in docs:
+        key = doc.metadata.get("content_hash") or doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+        parts.append(doc.page_content)
+    # Score the raw text, so escaped quotes do not split or inflate terms
+    kept = select_by_overlap(parts, question)
+    return " ".join(text.translate(_ESCAPE_TABLE) for text in kept)
+
+
+async def retrieve_book_quotes_context_per_question(state):
     """Retrieve book quotes context for the given question."""
-    # Handle both Pydantic models and dict
-    question = state.question if hasattr(state, "question") else state["question"]
+    question = state["question"]
 
-    docs_book_quotes = search_quotes(question)
-    book_qoutes = " ".join(doc.page_content for doc in docs_book_quotes)
-    book_qoutes_context = book_qoutes.replace('"', '\\"').replace(
-        "'", "\\'"
-    )  # Escape quotes for downstream processing
+    docs_book_quotes = await search_quotes.ainvoke(question)
+    book_qoutes_context = _join_documents(docs_book_quotes, question)
 
     return {"context": book_qoutes_context, "question": question}
 
 
-def retrieve_chunks_context_per_question(state):
+async def retrieve_chunks_context_per_question(state):
     """Retrieve relevant context for a given question. The context is retrieved from the book chunks and chapter summaries."""
-    # Handle both Pydantic models and dict
-    question = state.question if hasattr(state, "question") else state["question"]
-    docs = search_chunks(question)
-
-    # Concatenate document content
-    context = " ".join(doc.page_content for doc in docs)
-    context = context.replace('"', '\\"').replace(
-        "'", "\\'"
-    )  # Escape quotes for downstream processing
+    question = state["question"]
+    docs = await search_chunks.ainvoke(question)
+
+    context = _join_documents(docs, question)
     return {"context": context, "question": question}
 
 
-def keep_only_relevant_content(state):
-    """Filter and retain only the content from the retrieved documents that is relevant to the query."""
-    # Handle both Pydantic models and dict
-    question = getattr(
-        state, "question", state.get("question", "") if isinstance(state, dict) else ""
-    )
-    context = getattr(
-        state, "context", state.get("context", "") if isinstance(state, dict) else ""
-    )
+async def keep_only_relevant_content(state):
+    """Filter and retain only the content from the retrieved documents that is relevant to the query.
+
+    The same LLM call reports whether the filtered text is grounded in the
+    documents; if it is not, the full retrieved context is kept instead.
+    """
+    question = state.get("question", "")
+    context = state.get("context", "")
+
+    # Nothing was retrieved, so there is nothing to filter or check
+    if not context.strip():
+        return {
+            "relevant_context": "",
+            "context": context,
+            "question": question,
+            "grounded": True,
+        }
 
     # Prepare input for the LLM chain
     input_data = {"query": question, "retrieved_documents": context}
 
-    # Create prompt template from the prompt string
-    keep_only_relevant_content_prompt = ChatPromptTemplate.from_template(
-        keep_only_relevant_content_prompt_template
+    # Invoke the LLM chain to filter out non-relevant content and check grounding
+    output = await cached_ainvoke(
+        _keep_relevant_chain(), input_data, _keep_relevant_cache
     )
-
-    keep_only_relevant_content_chain = (
-        keep_only_relevant_content_prompt
-        | llm.with_structured_output(KeepRelevantContent, method="json_mode")
-    )
-    # Invoke the LLM chain to filter out non-relevant content
-    output = keep_only_relevant_content_chain.invoke(input_data)
+    # Already a str: the schema is validated by pydantic
     relevant_content = output.relevant_content
 
-    # Ensure the result is a string (in case it's not)
-    relevant_content = "".join(relevant_content)
-
-    # Escape quotes for downstream processing
-    relevant_content = relevant_content.replace('"', '\\"').replace("'", "\\'")
+    if output.grounded:
+        # Escape quotes for downstream processing
+        relevant_content = relevant_content.translate(_ESCAPE_TABLE)
+    else:
+        # Retrying would replay the cached output, so fall back to the
+        # retrieved context, which is already escaped
+        relevant_content = context
 
     return {
         "relevant_context": relevant_content,
         "context": context,
         "question": question,
+        "grounded": output.grounded,
     }
 
 
-def is_distilled_content_grounded_on_content(
-    state: QualitativeRetrievalGraphState,
-) -> str:
-    """Determine if the distilled content is grounded in the original context."""
-    # Extract distilled content and original context from state
-    # Handle both Pydantic models and dict
-    distilled_content = getattr(
-        state,
-        "relevant_context",
-        state.get("relevant_context", "") if isinstance(state, dict) else "",
-    )
-    original_context = getattr(
-        state, "context", state.get("context", "") if isinstance(state, dict) else ""
-    )
-
-    # Prepare input for the LLM chain
-    input_data = {
-        "distilled_content": distilled_content,
-        "original_context": original_context,
-    }
-
-    # Create prompt template and chain with structured output
-    is_distilled_content_grounded_on_content_prompt = ChatPromptTemplate.from_template(
-        is_distilled_content_grounded_on_content_prompt_template
-    )
-
-    # Force JSON mode with format parameter
-    is_distilled_content_grounded_on_content_chain = (
-        is_distilled_content_grounded_on_content_prompt
-        | llm.with_structured_output(
-            IsDistilledContentGroundedOnContent, method="json_mode"
-        )
-    )
-
-    # Invoke the LLM chain to check grounding
-    output = is_distilled_content_grounded_on_content_chain.invoke(input_data)
-    grounded = output.grounded
-
-    # Return result based on grounding
-    if grounded:
-        return "grounded on the original context"
-    else:
-        return "not grounded on the original context"
-
-
-def is_answer_grounded_on_context(state):
+async def is_answer_grounded_on_context(state):
     """Determine if the answer to the question is grounded in the facts.
 
     Args:
@@ -153,27 +182,12 @@ def is_answer_grounded_on_context(state):
         "hallucination" if the answer is not grounded in the context,
         "grounded on context" if the answer is grounded in the context.
     """
-    # Handle both Pydantic models and dict
-    context = getattr(
-        state, "context", state.get("context", "") if isinstance(state, dict) else ""
-    )
-    answer = getattr(
-        state, "answer", state.get("answer", "") if isinstance(state, dict) else ""
-    )
-    # Create the prompt object
-    is_grounded_on_facts_prompt = PromptTemplate(
-        template=is_grounded_on_facts_prompt_template,
-        input_variables=["context", "answer"],
-    )
-
-    # Build the chain: prompt -> LLM -> structured output
-    is_grounded_on_facts_chain = (
-        is_grounded_on_facts_prompt
-        | llm.with_structured_output(GroundedOnFacts, method="json_mode")
-    )
-
+    context = state.get("context", "")
+    answer = state.get("answer", "")
     # Use the is_grounded_on_facts_chain to check if the answer is grounded in the context
-    result = is_grounded_on_facts_chain.invoke({"context": context, "answer": answer})
+    result = await cached_ainvoke(
+        _is_grounded_chain(), {"context": context, "answer": answer}, _is_grounded_cache
+    )
     grounded_on_facts = result.grounded_on_facts
 
     if not grounded_on_facts:
@@ -182,32 +196,22 @@ def is_answer_grounded_on_context(state):
         return "grounded on context"
 
 
-def can_question_be_answered(state):
+async def can_question_be_answered(state):
     """Check if the question can be fully answered from the aggregated context.
 
     Returns: "useful" if it can be answered, "not_useful" if more context is needed.
     """
-    # Handle both Pydantic models and dict
-    question = state.question if hasattr(state, "question") else state["question"]
-    aggregated_context = (
-        state.aggregated_context
-        if hasattr(state, "aggregated_context")
-        else state.get("aggregated_context", "")
-    )
-
-    # Create the prompt for checking if the question can be answered
-    can_be_answered_prompt = ChatPromptTemplate.from_template(
-        can_be_answered_prompt_template
-    )
-
-    # Build the chain: prompt -> LLM -> structured output
-    can_be_answered_chain = can_be_answered_prompt | llm.with_structured_output(
-        CanBeAnswered, method="json_mode"
-    )
+    question = state["question"]
+    aggregated_context = joined_context(state)
+    # The judge is told to answer false for an empty context; skip the call
+    if not aggregated_context:
+        return "not_useful"
 
     # Check if the question can be fully answered from the aggregated context
-    result = can_be_answered_chain.invoke(
-        {"question": question, "context": aggregated_context}
+    result = await cached_ainvoke(
+        _can_be_answered_chain(),
+        {"question": question, "context": aggregated_context},
+        _can_be_answered_cache,
     )
 
     return "useful" if result.can_be_answered else "not_useful"
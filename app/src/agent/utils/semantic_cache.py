@@ -0,0 +1,200 @@
+"""Embedding-similarity cache for LLM chains keyed on free-text questions."""
+
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+
+def unit_vector(vector) -> np.ndarray:
+    """Return an embedding as a unit-length float32 array, the cache's key form."""
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class SemanticCache:
+    """Return a cached output when a new question is a near-paraphrase of an old one.
+
+    Keys are unit-normalized embeddings stacked in a float32 matrix, so a lookup
+    is a single matrix-vector product. Entries carry a scope (e.g. a hash of the
+    context a question was answered from) and only match within that scope.
+
+    With a path, entries are also written to a SQLite table and reloaded into
+    the matrix on startup, so a restarted process keeps its earlier hits.
+    """
+
+    def __init__(
+        self,
+        embedder: Embeddings,
+        threshold: float = 0.92,
+        maxsize: int = 256,
+        path: Optional[str] = None,
+        name: str = "default",
+        schema: Optional[Type[BaseModel]] = None,
+    ):
+        """Create a cache backed by the given embedding model.
+
+        Args:
+            embedder: Embedding model used to key entries.
+            threshold: Minimum cosine similarity for a hit.
+            maxsize: Entries kept before the oldest is dropped.
+            path: Optional SQLite file persisting entries across restarts.
+            name: Row namespace, so several caches can share one file.
+            schema: Pydantic model of the cached values; required with a path.
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.name = name
+        self.schema = schema
+        self._matrix: Optional[np.ndarray] = None
+        self._scopes: List[str] = []
+        self._values: List[Any] = []
+        self._row_ids: List[int] = []
+        self._lock = threading.Lock()  # Graph nodes may run on worker threads
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            if schema is None:
+                raise ValueError("A schema is required to persist cached values")
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        """Open the SQLite store and load its most recent entries."""
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+            "scope TEXT NOT NULL, emb BLOB NOT NULL, out TEXT NOT NULL)"
+        )
+        rows = self._conn.execute(
+            "SELECT id, scope, emb, out FROM semantic_cache WHERE name = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (self.name, self.maxsize),
+        ).fetchall()
+        rows.reverse()
+        if rows:
+            self._matrix = np.stack(
+                [np.frombuffer(emb, dtype=np.float32) for _, _, emb, _ in rows]
+            )
+        self._row_ids = [row_id for row_id, _, _, _ in rows]
+        self._scopes = [scope for _, scope, _, _ in rows]
+        self._values = [self.schema.model_validate_json(out) for _, _, _, out in rows]
+
+    def _embed(self, text: str) -> np.ndarray:
+        """Embed text as a unit-length float32 vector."""
+        return unit_vector(self.embedder.embed_query(text))
+
+    async def _aembed(self, text: str) -> np.ndarray:
+        """Async variant of _embed."""
+        return unit_vector(await self.embedder.aembed_query(text))
+
+    def lookup(self, vector: np.ndarray, scope: str = "") -> Optional[Any]:
+        """Return the closest cached output above the threshold, or None."""
+        with self._lock:
+            if self._matrix is None:
+                return None
+            sims = self._matrix @ vector
+            sims[[s != scope for s in self._scopes]] = -1.0
+            best = int(np.argmax(sims))
+            return self._values[best] if sims[best] >= self.threshold else None
+
+    def store(self, vector: np.ndarray, value: Any, scope: str = "") -> None:
+        """Add an entry, dropping the oldest one when the cache is full."""
+        with self._lock:
+            row = vector[np.newaxis, :]
+            if self._matrix is None:
+                self._matrix = row
+            else:
+                self._matrix = np.concatenate([self._matrix, row])
+            self._scopes.append(scope)
+            self._values.append(value)
+            self._row_ids.append(self._persist(vector, value, scope))
+            if len(self._values) > self.maxsize:
+                self._matrix = self._matrix[1:]
+                self._forget(self._row_ids[0])
+                del self._scopes[0], self._values[0], self._row_ids[0]
+
+    def _persist(self, vector: np.ndarray, value: Any, scope: str) -> int:
+        """Write an entry to the SQLite store and return its row id (-1 if none)."""
+        if self._conn is None:
+            return -1
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO semantic_cache (name, scope, emb, out) VALUES (?, ?, ?, ?)",
+                (self.name, scope, vector.tobytes(), value.model_dump_json()),
+            )
+        return cursor.lastrowid
+
+    def _forget(self, row_id: int) -> None:
+        """Delete an evicted entry from the SQLite store."""
+        if self._conn is None:
+            return
+        with self._conn:
+            self._conn.execute("DELETE FROM semantic_cache WHERE id = ?", (row_id,))
+
+    def get_or_compute(
+        self, text: str, compute: Callable[[], Any], scope: str = ""
+    ) -> Any:
+        """Return a cached output for a similar text, or compute and cache one."""
+        try:
+            vector = self._embed(text)
+        except Exception:
+            # The cache is an optimization; never fail the node on embedding errors
+            return compute()
+
+        value = self.lookup(vector, scope)
+        if value is None:
+            value = compute()
+            self.store(vector, value, scope)
+        return value
+
+    async def aget_or_compute(
+        self, text: str, compute: Callable[[], Awaitable[Any]], scope: str = ""
+    ) -> Any:
+        """Async variant of get_or_compute."""
+        try:
+            vector = await self._aembed(text)
+        except Exception:
+            return await compute()
+
+        value = self.lookup(vector, scope)
+        if value is None:
+            value = await compute()
+            self.store(vector, value, scope)
+        return value
+
+    def wrap(
+        self, chain, text_key: str, scope_key: Optional[str] = None
+    ) -> RunnableLambda:
+        """Wrap a chain so its inputs[text_key] is looked up semantically first.
+
+        Args:
+            chain: Runnable to invoke on a cache miss.
+            text_key: Input holding the free text to match on.
+            scope_key: Optional input that must match exactly, hashed into the scope.
+        """
+
+        def scope_of(inputs: Dict[str, Any]) -> str:
+            if scope_key is None:
+                return ""
+            scope_text = str(inputs.get(scope_key, ""))
+            return hashlib.blake2b(
+                scope_text.encode("utf-8"), digest_size=16
+            ).hexdigest()
+
+        def invoke(inputs: Dict[str, Any]) -> Any:
+            return self.get_or_compute(
+                inputs[text_key], lambda: chain.invoke(inputs), scope_of(inputs)
+            )
+
+        async def ainvoke(inputs: Dict[str, Any]) -> Any:
+            return await self.aget_or_compute(
+                inputs[text_key], lambda: chain.ainvoke(inputs), scope_of(inputs)
+            )
+
+        return RunnableLambda(invoke, afunc=ainvoke)
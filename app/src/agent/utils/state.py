@@ -1,44 +1,76 @@
 """State schemas for the LangGraph agent."""
 
+import operator
 from typing import Annotated, List, TypedDict
 
 from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
 
 
-class Input(BaseModel):
+class Input(TypedDict):
     """Input schema for the LangGraph agent."""
 
     question: str
 
 
-class State(BaseModel):
+class State(TypedDict, total=False):
     """State schema for the LangGraph agent."""
 
-    messages: Annotated[list, add_messages] = Field(default_factory=list)
+    messages: Annotated[list, add_messages]
+
+
+class PlanExecute(TypedDict, total=False):
+    """State schema for the PlanExecute node.
+
+    Graph state is internal, so it is a TypedDict: LangGraph passes plain dicts
+    between nodes without validating a model on every transition. Keys that no
+    node has written yet are absent, so read optional ones with .get().
+    """
+
+    curr_state: str  # current state of the agent
+    question: str  # original user question
+    query_to_retrieve_or_answer: str  # query to retrieve or answer
+    plan: List[str]  # plan to follow in future
+    context: str  # current context
+    past_steps: Annotated[List[str], operator.add]  # past steps taken
+    mapping: dict  # mapping of steps to tools
+    curr_context: str  # current context
+    # context gathered by each executed step, appended in parallel
+    aggregated_context: Annotated[List[str], operator.add]
+    relevant_context: str  # relevant context from retrieval
+    # answer-from-context steps held back until this round's retrievals join
+    answer_tasks: List[str]
+    answer_queries: List[str]
+    tool: str  # tool to use
+    response: str  # response from the tool
+
+
+def joined_context(state: PlanExecute) -> str:
+    """Render the context gathered by executed steps as one prompt string."""
+    return "\n\n".join(
+        c for c in state.get("aggregated_context", []) if c and c.strip()
+    )
 
 
-class PlanExecute(BaseModel):
-    """State schema for the PlanExecute node."""
+class PlanStepState(TypedDict):
+    """Private state for one plan step executed in a parallel fan-out branch."""
 
-    curr_state: str = Field(default="", description="current state of the agent")
-    question: str = Field(default="", description="original user question")
-    query_to_retrieve_or_answer: str = Field(
-        default="", description="query to retrieve or answer"
-    )
-    plan: List[str] = Field(
-        default_factory=list, description="plan to follow in future"
-    )
-    context: str = Field(default="", description="current context")
-    past_steps: List[str] = Field(default_factory=list, description="past steps taken")
-    mapping: dict = Field(default_factory=dict, description="mapping of steps to tools")
-    curr_context: str = Field(default="", description="current context")
-    aggregated_context: str = Field(default="", description="aggregated context")
-    relevant_context: str = Field(
-        default="", description="relevant context from retrieval"
-    )
-    tool: str = Field(default="", description="tool to use")
-    response: str = Field(default="", description="response from the tool")
+    question: str
+    curr_task: str
+    query: str
+    aggregated_context: str
+
+
+class AnswerStepsState(TypedDict):
+    """Private state for the plan steps answered together from existing context.
+
+    aggregated_context is taken after the round's retrievals have merged.
+    """
+
+    question: str
+    curr_tasks: List[str]
+    queries: List[str]
+    aggregated_context: str
 
 
 class Plan(BaseModel):
@@ -59,6 +91,10 @@ class ActPossibleResults(BaseModel):
 class TaskHandlerOutput(BaseModel):
     """Output schema for the task handler."""
 
+    task: str = Field(
+        default="",
+        description="Label of the task this decision is for, e.g. task1.",
+    )
     query: str = Field(
         description="The query to be either retrieved from the vector store, "
         "or the question that should be answered from context."
@@ -74,12 +110,23 @@ class TaskHandlerOutput(BaseModel):
     )
 
 
-class KeepRelevantContent(BaseModel):
-    """Schema for keeping only relevant content from retrieved documents."""
+class TaskHandlerBatch(BaseModel):
+    """Output schema for deciding the tools of all plan steps in one call."""
+
+    decisions: List[TaskHandlerOutput] = Field(
+        description="One decision per task, in the same order as the tasks."
+    )
+
+
+class DistilledAndGrounded(BaseModel):
+    """Schema for filtering retrieved documents and checking the result in one call."""
 
     relevant_content: str = Field(
         description="The relevant content from the retrieved documents that is relevant to the query."
     )
+    grounded: bool = Field(
+        description="True if the relevant content is grounded on the retrieved documents, False otherwise."
+    )
 
 
 class QualitativeRetrievalGraphState(TypedDict):
@@ -88,6 +135,7 @@ class QualitativeRetrievalGraphState(TypedDict):
     question: str
     context: str
     relevant_context: str
+    grounded: bool
 
 
 class QuestionAnswerFromContext(BaseModel):
@@ -98,14 +146,11 @@ class QuestionAnswerFromContext(BaseModel):
     )
 
 
-class IsDistilledContentGroundedOnContent(BaseModel):
-    """Schema for checking if distilled content is grounded in the original context."""
+class QuestionAnswerBatch(BaseModel):
+    """Schema for answering several questions from one shared context."""
 
-    grounded: bool = Field(
-        description="True if the distilled content is grounded on the original context, False otherwise."
-    )
-    explanation: str = Field(
-        description="An explanation of why the distilled content is or is not grounded on the original context."
+    answers: List[str] = Field(
+        description="One answer per question, in the same order as the questions."
     )
 
 
@@ -123,9 +168,6 @@ class CanBeAnswered(BaseModel):
     can_be_answered: bool = Field(
         description="True if the question can be fully answered from the context, False otherwise."
     )
-    explanation: str = Field(
-        description="Explanation of why the question can or cannot be fully answered."
-    )
 
 
 class FinalAnswer(BaseModel):
@@ -1,11 +1,15 @@
 import sys  # noqa: D100
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from langchain_core.documents import Document
 from langchain_core.tools import tool
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
+from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+from agent.utils.semantic_cache import SemanticCache, unit_vector
 
 # Add parent directory to path to access config and utils
 app_dir = Path(__file__).parent.parent.parent.parent
@@ -15,17 +19,67 @@ from config import Config
 from utils.embeddings import Embedder
 
 # Initialize Qdrant stores
-client = QdrantClient(url=Config.QDRANT_URL)
+# gRPC sends query vectors as protobuf instead of JSON float arrays
+client = QdrantClient(
+    url=Config.QDRANT_URL, prefer_grpc=True, grpc_port=Config.QDRANT_GRPC_PORT
+)
 embedder = Embedder()
 
+# The collections are created by the ingestion script; validating them here
+# would cost a Qdrant roundtrip and a dummy embedding request on every import
 chunks_store = QdrantVectorStore(
-    client=client, collection_name="book_chunks", embedding=embedder
+    client=client,
+    collection_name="book_chunks",
+    embedding=embedder,
+    validate_collection_config=False,
 )
 
 quotes_store = QdrantVectorStore(
-    client=client, collection_name="book_quotes", embedding=embedder
+    client=client,
+    collection_name="book_quotes",
+    embedding=embedder,
+    validate_collection_config=False,
+)
+
+# Collections keep int8 copies in RAM (see setup_collections); fetch twice the
+# candidates from them and rerank those with the on-disk float32 originals
+_SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
 )
 
+# Reworded sub-questions from the planner reuse earlier search results instead
+# of querying Qdrant again; entries are scoped to the collection and k searched
+_search_cache = SemanticCache(embedder, threshold=0.86)
+
+
+def _cached_search(
+    store: QdrantVectorStore,
+    query: str,
+    k: int,
+    vector: Optional[List[float]] = None,
+) -> List[Document]:
+    """Run a similarity search, reusing the results of a near-identical query.
+
+    The query is embedded once, or not at all when its vector is passed in,
+    and that vector serves both the cache lookup and the Qdrant search.
+    """
+    if vector is None:
+        vector = embedder.embed_query(query)
+    key = unit_vector(vector)
+    scope = f"{store.collection_name}:{k}"
+
+    docs = _search_cache.lookup(key, scope)
+    if docs is None:
+        docs = store.similarity_search_by_vector(
+            vector, k=k, search_params=_SEARCH_PARAMS
+        )
+        _search_cache.store(key, docs, scope)
+    return docs
+
+
+# Runs the chunk search of search_all while the calling thread queries quotes
+_search_pool = ThreadPoolExecutor(max_workers=4)
+
 
 @tool
 def search_chunks(query: str, k: int = 5) -> List[Document]:
@@ -36,7 +90,7 @@ def search_chunks(query: str, k: int = 5) -> List[Document]:
     Returns:
         List of relevant quotes
     """
-    return chunks_store.similarity_search(query, k=k)
+    return _cached_search(chunks_store, query, k)
 
 
 @tool
@@ -48,7 +102,7 @@ def search_quotes(query: str) -> List[Document]:
     Returns:
         List of relevant quotes
     """
-    return quotes_store.similarity_search(query)
+    return _cached_search(quotes_store, query, 4)
 
 
 @tool
@@ -62,6 +116,9 @@ def search_all(query: str, k: int = 3) -> List[Document]:
     Returns:
         Combined list of chunks and quotes
     """
-    return chunks_store.similarity_search(query, k=k) + quotes_store.similarity_search(
-        query, k=k
-    )
+    # Embed once for both searches; Qdrant batches only within one collection,
+    # so the two independent collections are queried concurrently instead
+    vector = embedder.embed_query(query)
+    chunks = _search_pool.submit(_cached_search, chunks_store, query, k, vector)
+    quotes = _cached_search(quotes_store, query, k, vector)
+    return chunks.result() + quotes
@@ -5,7 +5,7 @@ from langgraph.graph import END, StateGraph
 from agent.utils.retrieval_nodes import (
     keep_only_relevant_content,
 )
-from agent.utils.state import QualitativeRetrievalGraphState
+from agent.utils.state import PlanStepState, QualitativeRetrievalGraphState
 
 
 def build_retrieval_workflow(node_name, retrieve_fn):
@@ -23,17 +23,9 @@ def build_retrieval_workflow(node_name, retrieve_fn):
     graph.add_node("keep_only_relevant_content", keep_only_relevant_content)
     graph.set_entry_point(node_name)
     graph.add_edge(node_name, "keep_only_relevant_content")
-    # Skip grounding check for speed - go directly to END
+    # The grounding check runs in the same LLM call as the filtering, and
+    # ungrounded output is replaced by the retrieved context, so go to END
     graph.add_edge("keep_only_relevant_content", END)
-    # Original slower version with grounding check:
-    # graph.add_conditional_edges(
-    #     "keep_only_relevant_content",
-    #     is_distilled_content_grounded_on_content,
-    #     {
-    #         "grounded on the original context": END,
-    #         "not grounded on the original context": "keep_only_relevant_content",
-    #     },
-    # )
     app = graph.compile()
     # Optionally display the graph (commented out for subgraph usage)
     # try:
@@ -41,3 +33,26 @@ def build_retrieval_workflow(node_name, retrieve_fn):
     # except Exception:
     #     pass  # IPython not available or error in visualization
     return app
+
+
+def build_plan_step_node(workflow):
+    """Wrap a compiled retrieval workflow as a node for one fanned-out plan step.
+
+    Parallel steps may not write the shared single-value context fields, so the
+    distilled context is returned through the list-append reducer instead.
+
+    Args:
+        workflow: Compiled retrieval workflow from build_retrieval_workflow.
+
+    Returns:
+        Async node function taking a PlanStepState.
+    """
+
+    async def run_plan_step(state: PlanStepState) -> dict:
+        result = await workflow.ainvoke({"question": state["query"]})
+        return {
+            "aggregated_context": [result["relevant_context"]],
+            "past_steps": [state["curr_task"]],
+        }
+
+    return run_plan_step
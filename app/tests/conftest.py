@@ -0,0 +1,14 @@
+"""Make the app modules importable and keep imports offline."""
+
+import os
+import sys
+from pathlib import Path
+
+app_dir = Path(__file__).resolve().parent.parent
+
+# The agent imports config/utils from app/ and agent from app/src; ingestion
+# scripts import through the app package from the repository root
+sys.path[:0] = [str(app_dir / "src"), str(app_dir), str(app_dir.parent)]
+
+# Embedder() refuses to start without a key; no request is made in unit tests
+os.environ.setdefault("JINA_API_KEY", "test-key")
@@ -0,0 +1,75 @@
+import pytest
+
+from agent.utils.nodes import classify_step, names_both_sources, route_based_on_tool
+
+
+@pytest.mark.parametrize(
+    ("step", "expected"),
+    [
+        (
+            "Retrieve facts about Harry from book chunks",
+            ("Harry", "retrieve_chunks"),
+        ),
+        (
+            "retrieve the Sorting Hat song from the book chunks",
+            ("the Sorting Hat song", "retrieve_chunks"),
+        ),
+        (
+            "Retrieve Hagrid quotes from the quotes database",
+            ("Hagrid quotes", "retrieve_quotes"),
+        ),
+        (
+            "Answer the question who Harry is from existing context",
+            ("who Harry is", "answer_from_context"),
+        ),
+        (
+            "  Answer why Harry is famous from the context  ",
+            ("why Harry is famous", "answer_from_context"),
+        ),
+    ],
+)
+def test_canonical_steps_are_routed_without_the_llm(step, expected):
+    assert classify_step(step) == expected
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        "Find out who Harry is",
+        "Summarize the chapter",
+        "Retrieve facts about Harry",
+    ],
+)
+def test_ambiguous_steps_are_left_to_the_llm(step):
+    assert classify_step(step) is None
+
+
+def test_unknown_tools_fall_back_to_answering():
+    assert route_based_on_tool("retrieve_quotes") == "retrieve_quotes"
+    assert route_based_on_tool("answer_from_context") == "answer"
+    assert route_based_on_tool("search_web") == "answer"
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        "Retrieve facts about Harry from book chunks and quotes",
+        "Retrieve Hagrid's lines from the book chunks and the quotes",
+        "retrieve the Sorting Hat song from both the quotes and book chunks",
+    ],
+)
+def test_steps_naming_both_sources_fan_out(step):
+    assert names_both_sources(step)
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        "Retrieve Hagrid's quotes from the book chunks",
+        "Retrieve the chunk of text about Quidditch from the quotes database",
+        "Retrieve quotes about book chunks",
+        "Answer who said the quotes from existing context",
+    ],
+)
+def test_subjects_do_not_count_as_sources(step):
+    assert not names_both_sources(step)
@@ -0,0 +1,76 @@
+import asyncio
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from utils import embeddings as embeddings_module
+from utils.embeddings import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls: List[List[str]] = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_embeds_only_unseen_unique_texts():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner)
+
+    assert cached.embed_documents(["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+    assert cached.embed_documents(["bb", "ccc"]) == [[2.0], [3.0]]
+    assert inner.calls == [["a", "bb"], ["ccc"]]
+
+
+def test_evicts_least_recently_used_vector():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, max_size=2)
+
+    cached.embed_documents(["a", "b"])
+    cached.embed_query("a")  # Refreshes "a", so "b" is the oldest entry
+    cached.embed_query("c")
+
+    assert cached.stats()["size"] == 2
+    cached.embed_documents(["a", "b"])
+    assert inner.calls[-1] == ["b"]
+
+
+def test_recomputes_expired_vector(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embeddings_module.time, "monotonic", clock)
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, ttl_seconds=10)
+
+    cached.embed_query("a")
+    clock.now = 10
+    cached.embed_query("a")
+    assert len(inner.calls) == 1
+
+    clock.now = 10.5
+    cached.embed_query("a")
+    assert len(inner.calls) == 2
+    assert cached.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+
+def test_async_path_shares_the_cache():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner)
+
+    cached.embed_documents(["a"])
+    vectors = asyncio.run(cached.aembed_documents(["a", "bb"]))
+    assert vectors == [[1.0], [2.0]]
+    assert inner.calls == [["a"], ["bb"]]
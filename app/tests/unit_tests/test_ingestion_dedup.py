@@ -0,0 +1,85 @@
+from app.scripts import ingestion
+from app.scripts.ingestion import QdrantIngestion, _IngestionStats
+from langchain_core.documents import Document
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+
+def make_pipeline(stored_texts, lookups):
+    # Skip __init__, which opens a Qdrant client; dedup only needs the lookup
+    pipeline = QdrantIngestion.__new__(QdrantIngestion)
+    stored = {QdrantIngestion.compute_content_hash(text) for text in stored_texts}
+
+    def find_existing_hashes(collection_name, new_hashes):
+        lookups.append(list(new_hashes))
+        return stored.intersection(new_hashes)
+
+    pipeline.find_existing_hashes = find_existing_hashes
+    return pipeline
+
+
+def documents(*texts):
+    return iter(
+        Document(page_content=text, metadata={"chapter_number": i})
+        for i, text in enumerate(texts)
+    )
+
+
+def test_duplicates_are_skipped_across_windows(monkeypatch):
+    monkeypatch.setattr(ingestion, "_HASH_LOOKUP_SIZE", 2)
+    lookups = []
+    pipeline = make_pipeline(["stored"], lookups)
+    stats = _IngestionStats(total_chapters=1)
+
+    batches = list(
+        pipeline._iter_new_batches(
+            documents("a", "b", "a", "stored", "c", "b"), "book_chunks", 2, stats
+        )
+    )
+
+    texts = [doc.page_content for batch in batches for doc in batch]
+    assert texts == ["a", "b", "c"]
+    # Hashes queued by an earlier window are not looked up again
+    assert [len(hashes) for hashes in lookups] == [2, 1, 1]
+    assert (stats.seen, stats.skipped) == (6, 3)
+
+
+def test_new_documents_carry_their_content_hash(monkeypatch):
+    monkeypatch.setattr(ingestion, "_HASH_LOOKUP_SIZE", 2)
+    pipeline = make_pipeline([], [])
+    stats = _IngestionStats(total_chapters=1)
+
+    (batch,) = pipeline._iter_new_batches(documents("a"), "book_chunks", 2, stats)
+
+    assert batch[0].metadata["content_hash"] == QdrantIngestion.compute_content_hash(
+        "a"
+    )
+
+
+def test_points_in_the_old_hash_format_are_dropped():
+    pipeline = QdrantIngestion.__new__(QdrantIngestion)
+    pipeline.client = QdrantClient(":memory:")
+    pipeline.client.create_collection(
+        "book_chunks", vectors_config=VectorParams(size=2, distance=Distance.COSINE)
+    )
+    current_hash = QdrantIngestion.compute_content_hash("new")
+    pipeline.client.upsert(
+        "book_chunks",
+        [
+            PointStruct(
+                id=1,
+                vector=[1.0, 0.0],
+                payload={"metadata": {"content_hash": "a3f1c0ffee"}},  # MD5 hex
+            ),
+            PointStruct(
+                id=2,
+                vector=[1.0, 0.0],
+                payload={"metadata": {"content_hash": current_hash}},
+            ),
+        ],
+    )
+
+    assert pipeline.drop_legacy_points("book_chunks") == 1
+    assert pipeline.drop_legacy_points("book_chunks") == 0
+    assert [point.id for point in pipeline.client.scroll("book_chunks")[0]] == [2]
+    assert pipeline.drop_legacy_points("missing") == 0
@@ -0,0 +1,37 @@
+from agent.utils.llm_cache import LLMCache, cached_invoke, make_cache_key
+
+
+class CountingChain:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return inputs["question"].upper()
+
+
+def test_key_ignores_dict_order():
+    assert make_cache_key({"a": 1, "b": [2]}) == make_cache_key({"b": [2], "a": 1})
+    assert make_cache_key({"a": 1}) != make_cache_key({"a": 2})
+
+
+def test_evicts_least_recently_used_output():
+    cache = LLMCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # Refreshes "a", so "b" is evicted next
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cached_invoke_reuses_output_for_same_inputs():
+    chain = CountingChain()
+    cache = LLMCache()
+
+    assert cached_invoke(chain, {"question": "who"}, cache) == "WHO"
+    assert cached_invoke(chain, {"question": "who"}, cache) == "WHO"
+    assert cached_invoke(chain, {"question": "why"}, cache) == "WHY"
+    assert chain.calls == 2
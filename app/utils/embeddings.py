@@ -1,18 +1,140 @@
 """Embeddings using Jina Cloud API via LangChain integration."""
 
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
 from langchain_community.embeddings import JinaEmbeddings
+from langchain_core.embeddings import Embeddings
 
 from config import Config
 
 
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that reuses vectors for texts embedded recently.
+
+    Agent steps re-embed the same queries and overlapping chunks repeat text,
+    so each text's vector is kept in a bounded LRU with a TTL and only unseen
+    texts are sent to the underlying API.
+    """
+
+    def __init__(
+        self, embeddings: Embeddings, max_size: int = 2000, ttl_seconds: float = 600
+    ):
+        """Wrap an embeddings model with an empty cache.
+
+        Args:
+            embeddings: Model called for texts not in the cache.
+            max_size: Maximum number of cached vectors.
+            ttl_seconds: Age after which a cached vector is recomputed.
+        """
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.RLock()  # Tools and ingestion embed from threads
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _put(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, texts: List[str]) -> tuple:
+        """Return cached vectors (None where missing) and the unique missing texts."""
+        keys = [self._key(text) for text in texts]
+        vectors = [self._get(key) for key in keys]
+        missing: Dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        return keys, vectors, missing
+
+    def _fill(self, keys, vectors, missing, computed) -> List[List[float]]:
+        new = dict(zip(missing, computed))
+        for key, vector in new.items():
+            self._put(key, vector)
+        return [v if v is not None else new[k] for k, v in zip(keys, vectors)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, calling the API only for those not cached."""
+        keys, vectors, missing = self._lookup(texts)
+        computed = (
+            self.embeddings.embed_documents(list(missing.values())) if missing else []
+        )
+        return self._fill(keys, vectors, missing, computed)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the vector of an identical recent query."""
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._put(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents.
+
+        JinaEmbeddings falls back to the base class, which runs the sync
+        request on the default executor, so misses still occupy a thread.
+        """
+        keys, vectors, missing = self._lookup(texts)
+        computed = (
+            await self.embeddings.aembed_documents(list(missing.values()))
+            if missing
+            else []
+        )
+        return self._fill(keys, vectors, missing, computed)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query."""
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._put(key, vector)
+        return vector
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache hit and miss counts and the number of cached vectors."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+
 def Embedder():
-    """Create and return a Jina embeddings instance."""
+    """Create and return a cached Jina embeddings instance."""
     if not Config.JINA_API_KEY:
         raise ValueError("JINA_API_KEY environment variable is not set")
 
-    return JinaEmbeddings(
-        jina_api_key=Config.JINA_API_KEY,
-        model_name=Config.EMBEDDING_MODEL,
+    return CachedEmbeddings(
+        JinaEmbeddings(
+            jina_api_key=Config.JINA_API_KEY,
+            model_name=Config.EMBEDDING_MODEL,
+        )
     )
 
 